@@ -1,4 +1,4 @@
-import bpy, math, traceback
+import bpy, heapq, itertools, math, time, traceback
 
 from bpy.types import (Panel,
                        Operator,
@@ -11,7 +11,9 @@ from mathutils.geometry import (
                 normal)
 
 import array
-from . import lib
+import numpy as np
+from bpy.app.handlers import persistent
+from . import lib, overlay
 
 
 # This program is free software; you can redistribute it and/or modify
@@ -39,6 +41,200 @@ bl_info = {
 }
 
 
+# Live concave
+# -------------------------------------
+
+# Edited meshes are re-classified from a debounced timer, only the faces
+# whose vertices moved since the last run.
+LIVE_DELAY = 0.25
+live_state = {}
+live_dirty = set()
+live_last_update = 0.0
+
+
+def tile_budget(mytool):
+    # Bytes, 0 when tiling is off
+    return mytool.int_tileBudget * 1024 * 1024 if mytool.bool_tiled else 0
+
+
+def mode_set(mode):
+    # Mode switches rebuild the edit mesh, counted for the profiler
+    bpy.ops.object.mode_set(mode=mode)
+    lib.profiler.count("bpy.ops calls")
+    lib.profiler.count("mode switches")
+
+
+def undo_push(message):
+    bpy.ops.ed.undo_push(message=message)
+    lib.profiler.count("bpy.ops calls")
+
+
+def store_results(context, results):
+    """Write (mesh, check, face mask, params) results as face attributes.
+
+    Attributes of meshes in edit mode would be overwritten when leaving it,
+    so this switches to object mode for the writes.
+    """
+
+    if not results:
+        return
+
+    mode = context.object.mode if context.object else "OBJECT"
+    if mode != "OBJECT":
+        mode_set('OBJECT')
+
+    for me, check, mask, params in results:
+        lib.mesh_store_result(me, check, mask, params)
+
+    if mode != "OBJECT":
+        mode_set(mode)
+
+
+def stored_faces(ob, check, params):
+    # Face indices of a still valid stored result, or None
+    if ob.mode == "EDIT":
+        ob.update_from_editmode()
+    mask = lib.mesh_load_result(ob.data, check, params)
+    return None if mask is None else np.flatnonzero(mask)
+
+
+# Rows of the last mesh health report, see SierraMeshHealth_OT_Operator
+health_rows = []
+
+HEALTH_COLUMNS = (
+    ("concave", "Cc"),
+    ("distorted", "Ds"),
+    ("self_intersect", "In"),
+    ("thickness", "Th"),
+)
+
+
+@persistent
+def live_concave_depsgraph(scene, depsgraph):
+    global live_last_update
+
+    if not scene.my_tool.bool_liveConcave:
+        return
+
+    for update in depsgraph.updates:
+        if not update.is_updated_geometry or not isinstance(update.id, bpy.types.Object):
+            continue
+        ob = update.id.original
+        if ob.type == "MESH" and ob.select_get():
+            live_dirty.add(ob.name)
+
+    if live_dirty:
+        live_last_update = time.perf_counter()
+        if not bpy.app.timers.is_registered(live_concave_flush):
+            bpy.app.timers.register(live_concave_flush, first_interval=LIVE_DELAY)
+
+
+def live_concave_flush():
+    wait = live_last_update + LIVE_DELAY - time.perf_counter()
+    if wait > 0.0:
+        return wait
+
+    tolerance = bpy.context.scene.my_tool.float_concaveTolerance
+
+    for name in live_dirty:
+        ob = bpy.data.objects.get(name)
+        if ob is None or ob.type != "MESH":
+            live_state.pop(name, None)
+            continue
+
+        if ob.mode == "EDIT":
+            ob.update_from_editmode()
+        me = ob.data
+
+        state = live_state.get(name)
+        faces = None
+        if state is not None and state["tolerance"] == tolerance:
+            faces = lib.concave_arrays_update(state["arrays"], me)
+
+        if faces is None:
+            arrays = lib.mesh_concave_arrays(me)
+            state = live_state[name] = {
+                "arrays": arrays,
+                "mask": lib.concave_face_mask(arrays, tolerance),
+                "tolerance": tolerance,
+            }
+            faces = np.arange(len(state["mask"]))
+        elif len(faces):
+            state["mask"][faces] = lib.concave_face_mask(state["arrays"], tolerance, faces)
+
+        if bpy.context.scene.my_tool.bool_concaveFlip:
+            live_concave_highlight(ob, state["mask"], faces)
+        else:
+            concave = np.flatnonzero(state["mask"])
+            tris = state["arrays"]["tri_vert"][lib.face_triangles(state["arrays"], concave)]
+            overlay.show("concave", ob, state["arrays"]["co"], tris)
+
+    live_dirty.clear()
+    return None
+
+
+def live_concave_highlight(ob, mask, faces):
+    """Select the concave faces among ``faces``, only touching faces that change."""
+
+    me = ob.data
+    if not len(faces):
+        return
+
+    select = np.empty(len(me.polygons), dtype=bool)
+    me.polygons.foreach_get("select", select)
+    changed = faces[select[faces] != mask[faces]]
+    if not len(changed):
+        return
+
+    if ob.mode == "EDIT":
+        bm = bmesh.from_edit_mesh(me)
+        bm.faces.ensure_lookup_table()
+        for i in changed.tolist():
+            bm.faces[i].select_set(bool(mask[i]))
+        bmesh.update_edit_mesh(me, loop_triangles=False, destructive=False)
+    else:
+        select[changed] = mask[changed]
+        lib.mesh_select_faces(me, select)
+
+
+def update_live_concave(self, context):
+    live_state.clear()
+    live_dirty.clear()
+
+    if self.bool_liveConcave:
+        live_dirty.update(ob.name for ob in context.selected_objects if ob.type == "MESH")
+        if not bpy.app.timers.is_registered(live_concave_flush):
+            bpy.app.timers.register(live_concave_flush)
+    else:
+        # Not updated any more, would stay drawn at the old positions
+        overlay.clear("concave")
+
+
+def update_profiling(self, context):
+    lib.profiler.enabled = self.bool_profiling
+
+
+def sync_settings():
+    # Update callbacks only run on change, apply the values saved in the file
+    scene = getattr(bpy.context, "scene", None)
+    if scene is None:
+        return
+    mytool = scene.my_tool
+    lib.profiler.enabled = mytool.bool_profiling
+    lib.analysis_cache.budget = mytool.int_cacheBudget * 1024 * 1024
+    lib.analysis_cache.trim()
+
+
+@persistent
+def sync_settings_load(dummy):
+    sync_settings()
+
+
+def update_cache_budget(self, context):
+    lib.analysis_cache.budget = self.int_cacheBudget * 1024 * 1024
+    lib.analysis_cache.trim()
+
+
 class SierraSettings(bpy.types.PropertyGroup):
 
     string_prefix : bpy.props.StringProperty(
@@ -92,6 +288,57 @@ class SierraSettings(bpy.types.PropertyGroup):
         default="object"
     )
 
+    enum_renameTypes : bpy.props.EnumProperty(
+        name="Datablocks",
+        description="Datablock types to rename, meshes take the name of their object",
+        items=[
+            ("OBJECTS", "Objects", ""),
+            ("MESHES", "Meshes", ""),
+            ("MATERIALS", "Materials", ""),
+            ("COLLECTIONS", "Collections", ""),
+            ("IMAGES", "Images", ""),
+            ("ACTIONS", "Actions", ""),
+        ],
+        options={"ENUM_FLAG"},
+        default={"OBJECTS"},
+    )
+
+    enum_renameScope : bpy.props.EnumProperty(
+        name="Scope",
+        description="Which datablocks to rename",
+        items=[
+            ("SELECTED", "Selected", "Datablocks used by the selected objects"),
+            ("FILE", "File", "Every local datablock in the file"),
+        ],
+        default="SELECTED",
+    )
+
+    bool_useTemplate : bpy.props.BoolProperty(
+        name="Use Template",
+        description="Build names from a template instead of prefix, name and suffix",
+        default=False,
+    )
+
+    string_template : bpy.props.StringProperty(
+        name="Template",
+        description="Tokens: {name} {collection} {type} {polys} {counter:pad:start:step} {g1} {g:group}",
+        default="SM_{name}_{counter:2}",
+    )
+
+    string_renameMatch : bpy.props.StringProperty(
+        name="Match",
+        description="Regular expression searched in the original name, its groups are {g1}, {g:group}",
+        default="",
+    )
+
+    int_previewRows : bpy.props.IntProperty(
+        name="Preview Rows",
+        description="Number of selected objects to preview",
+        default=5,
+        min=0,
+        max=50,
+    )
+
     vector_creaseProperties : bpy.props.FloatVectorProperty(
         name="Crease Properties",
         description="Floor, Maximum, Tolerance",
@@ -101,6 +348,130 @@ class SierraSettings(bpy.types.PropertyGroup):
 
     )
 
+    int_cacheBudget : bpy.props.IntProperty(
+        name="Cache Budget",
+        description="Memory kept for analysis results between runs, in MB",
+        default=256,
+        min=0,
+        update=update_cache_budget,
+    )
+
+    float_thickness : bpy.props.FloatProperty(
+        name="Thickness",
+        description="Minimum wall thickness",
+        default=0.001,
+        min=0,
+        subtype="DISTANCE",
+    )
+
+    bool_concaveFlip : bpy.props.BoolProperty(
+        name="Flip Normals",
+        description="Select concave faces and flip their normals instead of drawing an overlay, edits the mesh",
+        default=False,
+    )
+
+    float_distortAngle : bpy.props.FloatProperty(
+        name="Distortion",
+        description="Maximum angle between a corner and its face before the face counts as distorted",
+        default=0.0872665,
+        min=0,
+        max=1.5707963,
+        subtype="ANGLE",
+    )
+
+    bool_interObject : bpy.props.BoolProperty(
+        name="Between Objects",
+        description="Also check selected objects against each other for intersections",
+        default=False,
+    )
+
+    bool_liveConcave : bpy.props.BoolProperty(
+        name="Live Concave",
+        description="Re-check concave faces of the selected meshes while editing",
+        default=False,
+        update=update_live_concave,
+    )
+
+    enum_healthChecks : bpy.props.EnumProperty(
+        name="Checks",
+        description="Checks the health report runs",
+        items=[
+            ("CONCAVE", "Concave", "Faces with non-convex corners"),
+            ("DISTORTED", "Distorted", "Faces that are not flat within the distortion angle"),
+            ("SELF_INTERSECT", "Intersect", "Faces that intersect other faces of the mesh"),
+            ("THICKNESS", "Thickness", "Faces closer than the thickness to the opposite side"),
+        ],
+        options={"ENUM_FLAG"},
+        default={"CONCAVE", "DISTORTED", "SELF_INTERSECT", "THICKNESS"},
+    )
+
+    bool_tiled : bpy.props.BoolProperty(
+        name="Tiled",
+        description="Check meshes larger than the memory budget one spatial tile at a time",
+        default=False,
+    )
+
+    int_tileBudget : bpy.props.IntProperty(
+        name="Tile Budget (MB)",
+        description="Working memory the checks may use per mesh before switching to tiles",
+        default=1024,
+        min=16,
+        soft_max=16384,
+    )
+
+    enum_healthSort : bpy.props.EnumProperty(
+        name="Sort",
+        description="Column the health report is sorted by",
+        items=[
+            ("object", "Name", ""),
+            ("faces", "Faces", ""),
+            ("area", "Area", ""),
+            ("concave", "Concave", ""),
+            ("distorted", "Distorted", ""),
+            ("self_intersect", "Intersect", ""),
+            ("thickness", "Thickness", ""),
+            ("total_ms", "Time", ""),
+        ],
+        default="object",
+    )
+
+    bool_healthDescending : bpy.props.BoolProperty(
+        name="Descending",
+        description="Sort the health report from high to low",
+        default=False,
+    )
+
+    bool_applyModifiers : bpy.props.BoolProperty(
+        name="Modifiers",
+        description="Check the meshes with their modifiers applied",
+        default=False,
+    )
+
+    bool_storeResults : bpy.props.BoolProperty(
+        name="Store Results",
+        description="Save flagged faces as face attributes in the file, unchanged meshes reuse them instead of checking again",
+        default=False,
+    )
+
+    bool_showHealth : bpy.props.BoolProperty(
+        name="Show Health",
+        description="Show the mesh health report",
+        default=False,
+    )
+
+    bool_profiling : bpy.props.BoolProperty(
+        name="Profiling",
+        description="Time operators and helpers and count the work they do",
+        default=False,
+        update=update_profiling,
+    )
+
+    bool_showProfile : bpy.props.BoolProperty(
+        name="Show Profile",
+        description="Show profiling results",
+        default=False,
+    )
+
 
 
 class Renamer_PT_Panel(bpy.types.Panel):
@@ -117,18 +488,28 @@ class Renamer_PT_Panel(bpy.types.Panel):
         layout = self.layout
 
         renamebox = layout.box()
-        renamebox.label(text="Rename")
-        row = renamebox.prop(mytool, "string_prefix")
-        row = renamebox.prop(mytool, "enum_suffixAction")
-        if mytool.enum_suffixAction == "1":
-            row = renamebox.prop(mytool, "string_suffix")
-        elif mytool.enum_suffixAction == "2":
-            row = renamebox.prop(mytool, "int_leading")
-        elif mytool.enum_suffixAction == "3":
-            row = renamebox.prop(mytool, "string_suffix")
-            row = renamebox.prop(mytool, "int_leading")
-        row = renamebox.prop(mytool, "string_rename")
         row = renamebox.row()
+        row.label(text="Rename")
+        row.prop(mytool, "bool_useTemplate", text="Template")
+        if mytool.bool_useTemplate:
+            renamebox.prop(mytool, "string_template")
+            renamebox.prop(mytool, "string_renameMatch")
+            self.draw_preview(context, renamebox)
+        else:
+            row = renamebox.prop(mytool, "string_prefix")
+            row = renamebox.prop(mytool, "enum_suffixAction")
+            if mytool.enum_suffixAction == "1":
+                row = renamebox.prop(mytool, "string_suffix")
+            elif mytool.enum_suffixAction == "2":
+                row = renamebox.prop(mytool, "int_leading")
+            elif mytool.enum_suffixAction == "3":
+                row = renamebox.prop(mytool, "string_suffix")
+                row = renamebox.prop(mytool, "int_leading")
+            row = renamebox.prop(mytool, "string_rename")
+        row = renamebox.row()
+        row.prop(mytool, "enum_renameTypes", expand=True)
+        row = renamebox.row()
+        row.prop(mytool, "enum_renameScope", expand=True)
         row.operator("object.sierrarename", text="Rename")
 
         creasebox = layout.box()
@@ -143,7 +524,109 @@ class Renamer_PT_Panel(bpy.types.Panel):
         toolbox = layout.box()
         toolbox.label(text="Tools")
         toolbox.prop(mytool, "float_concaveTolerance", text="Tolerance", slider=True, expand=True, index=0)
-        toolbox.operator("object.showconcave", text="Show Concave")
+        row = toolbox.row(align=True)
+        row.operator("object.showconcave", text="Show Concave")
+        row.prop(mytool, "bool_liveConcave", text="Live", toggle=True)
+        row = toolbox.row(align=True)
+        row.prop(mytool, "bool_concaveFlip")
+        row.operator("object.sierraclearoverlay", text="", icon="X")
+        toolbox.prop(mytool, "float_thickness")
+        row = toolbox.row(align=True)
+        row.operator("object.sierrameshcheck", text="Thickness").check = "THICKNESS"
+        row.operator("object.sierrameshcheck", text="Intersections").check = "SELF_INTERSECT"
+        toolbox.prop(mytool, "bool_interObject")
+        row = toolbox.row(align=True)
+        row.prop(mytool, "float_distortAngle")
+        row.operator("object.sierrameshcheck", text="Distorted").check = "DISTORTED"
+        toolbox.prop(mytool, "int_cacheBudget")
+
+        healthbox = layout.box()
+        row = healthbox.row()
+        row.prop(mytool, "bool_showHealth", text="Mesh Health", emboss=False,
+                 icon="TRIA_DOWN" if mytool.bool_showHealth else "TRIA_RIGHT")
+        if mytool.bool_showHealth:
+            row = healthbox.row(align=True)
+            row.prop(mytool, "enum_healthChecks", expand=True)
+            row = healthbox.row(align=True)
+            row.prop(mytool, "bool_tiled", toggle=True)
+            sub = row.row(align=True)
+            sub.active = mytool.bool_tiled
+            sub.prop(mytool, "int_tileBudget", text="MB")
+            row = healthbox.row(align=True)
+            row.prop(mytool, "bool_applyModifiers", toggle=True)
+            row.prop(mytool, "bool_storeResults", toggle=True)
+            row.operator_menu_enum("object.sierraresultdiff", "check", text="Diff")
+            row.operator("object.sierraclearoverlay", text="", icon="X")
+            row = healthbox.row(align=True)
+            row.operator("object.sierrahealth", text="Run Checks")
+            row.operator("object.sierrahealthexport", text="", icon="EXPORT")
+            if health_rows:
+                self.draw_health(context, healthbox)
+
+        profilebox = layout.box()
+        row = profilebox.row()
+        row.prop(mytool, "bool_showProfile", text="Profiling", emboss=False,
+                 icon="TRIA_DOWN" if mytool.bool_showProfile else "TRIA_RIGHT")
+        row.prop(mytool, "bool_profiling", text="")
+        if mytool.bool_showProfile:
+            report = lib.profiler.report()
+            col = profilebox.column(align=True)
+            for name, timing in report["timings"].items():
+                split = col.split(factor=0.6)
+                split.label(text=name)
+                split.label(text=f"{timing['calls']}x {lib.clean_float(timing['total_s'] * 1000, 1)} ms")
+            for name, value in report["counters"].items():
+                split = col.split(factor=0.6)
+                split.label(text=name)
+                split.label(text=str(value))
+            row = profilebox.row(align=True)
+            row.operator("object.sierraprofilereset", text="Reset")
+            row.operator("object.sierraprofiledump", text="Dump")
+
+
+
+    def draw_health(self, context, layout):
+        mytool = context.scene.my_tool
+        row = layout.row(align=True)
+        row.prop(mytool, "enum_healthSort", text="")
+        row.prop(mytool, "bool_healthDescending", text="", icon="SORT_DESC" if mytool.bool_healthDescending else "SORT_ASC")
+
+        sort = mytool.enum_healthSort
+        rows = sorted(health_rows, key=lambda r: -1 if r[sort] is None else r[sort], reverse=mytool.bool_healthDescending)
+
+        col = layout.column(align=True)
+        split = col.split(factor=0.3)
+        split.label(text="Object")
+        sub = split.row(align=True)
+        for text in ("Faces", "Area") + tuple(text for name, text in HEALTH_COLUMNS) + ("ms",):
+            sub.label(text=text)
+
+        for r in rows:
+            split = col.split(factor=0.3)
+            split.label(text=r["object"])
+            sub = split.row(align=True)
+            sub.label(text=str(r["faces"]))
+            sub.label(text=lib.clean_float(r["area"], 2))
+            for name, text in HEALTH_COLUMNS:
+                sub.label(text="-" if r[name] is None else str(r[name]))
+            sub.label(text=lib.clean_float(r["total_ms"], 1))
+
+    def draw_preview(self, context, layout):
+        mytool = context.scene.my_tool
+        try:
+            format_name = lib.compile_name_template(mytool.string_template, mytool.string_renameMatch)
+        except ValueError as e:
+            layout.label(text=str(e), icon="ERROR")
+            return
+
+        layout.prop(mytool, "int_previewRows")
+        # Only the visible rows are named, in the order the operator uses
+        rows = heapq.nsmallest(mytool.int_previewRows, context.selected_objects, key=lambda ob: lib.natural_key(ob.name))
+        col = layout.column(align=True)
+        for i, ob in enumerate(rows):
+            split = col.split(factor=0.5)
+            split.label(text=ob.name)
+            split.label(text=format_name(ob, i), icon="RIGHTARROW_THIN")
 
 
 
@@ -173,6 +656,7 @@ class SierraToggleUVLines_OT_Operator(bpy.types.Operator):
     bl_label="sierratogglelines"
     bl_description="Toggles Between Outline and Black"
 
+    @lib.profiled_execute("uv.sierratogglelines")
     def execute(self, context):
         scene = context.scene
         mytool = scene.my_tool
@@ -196,49 +680,25 @@ class SierraToggleCrease_OT_Operator(bpy.types.Operator):
     def poll(cls, context):
         return context.mode == 'EDIT_MESH'
 
+    @lib.profiled_execute("object.sierratogglecrease")
     def execute(self, context):
         scene = context.scene
         mytool = scene.my_tool
         OBs = bpy.context.selected_objects
 
-        ver = bpy.app.version[0]
-        if (ver == 3):
-            bm = bmesh.from_edit_mesh(bpy.context.edit_object.data)
-            crease_layer = bm.edges.layers.crease.verify()
-            for e in bm.edges:
-                if e.select == True:
-                    if e[crease_layer] < mytool.vector_creaseProperties[0] + mytool.vector_creaseProperties[2]:
-                        e[crease_layer] = mytool.vector_creaseProperties[1]
-                    elif e[crease_layer] > mytool.vector_creaseProperties[1] - mytool.vector_creaseProperties[2]:
-                        e[crease_layer] = mytool.vector_creaseProperties[0]
-            bmesh.update_edit_mesh(bpy.context.object.data)
-            bm.free()
-        else:
-            bm = bmesh.from_edit_mesh(bpy.context.object.data)
-            crease_layer = bm.edges.layers.float.get("crease_edge")
-            if not crease_layer:
-                bpy.ops.geometry.attribute_add(name="crease_edge", domain='EDGE')
-                bmesh.update_edit_mesh(bpy.context.object.data)
-                bm.free()   
-                bm = bmesh.from_edit_mesh(bpy.context.object.data)
-                crease_layer = bm.edges.layers.float.get("crease_edge")
-            
-            for e in bm.edges:
-                if e.select:
-                    if e[crease_layer] < mytool.vector_creaseProperties[0] + mytool.vector_creaseProperties[2]:
-                        e[crease_layer] = mytool.vector_creaseProperties[1]
-                    elif e[crease_layer] > mytool.vector_creaseProperties[1] - mytool.vector_creaseProperties[2]:
-                        e[crease_layer] = mytool.vector_creaseProperties[0]
-
-            bmesh.update_edit_mesh(bpy.context.object.data)
-            bm.free()   
+        floor, maximum, tolerance = mytool.vector_creaseProperties
+        # One object per mesh, a second user would toggle the creases back
+        for ob in context.objects_in_mode_unique_data:
+            if ob.type != "MESH" or not ob.data.total_edge_sel:
+                continue
+            lib.edit_mesh_toggle_creases(ob, floor, maximum, tolerance)
 
         return {"FINISHED"}
 
 class SierraStackUnstack_OT_Operator(bpy.types.Operator):
     bl_idname= "uv.sierrastack"
     bl_label="Sierra Stacker"
-    bl_description="Stacks then unstacks"
+    bl_description="Stacks similar UV islands then lays each stack out along an axis"
     bl_options = {'REGISTER', 'UNDO'}
 
     margin: bpy.props.FloatProperty(
@@ -271,13 +731,18 @@ class SierraStackUnstack_OT_Operator(bpy.types.Operator):
         layout.prop(self, "axis", expand=True)
 
 
+    @lib.profiled_execute("uv.sierrastack")
     def execute(self, context):
-        scene = context.scene
-        mytool = scene.my_tool
-        OBs = bpy.context.selected_objects
-        bpy.ops.uv.toolkit_stack_islands()
-        bpy.ops.uv.toolkit_unstack_islands(margin=self.margin, axis=self.axis)
+        OBs = [ob for ob in context.objects_in_mode_unique_data if ob.type == "MESH"]
 
+        # UVs are read and written as mesh buffers, which needs object mode
+        mode_set('OBJECT')
+        moved = 0
+        for ob in OBs:
+            moved += lib.mesh_stack_unstack_uvs(ob.data, axis=self.axis, margin=self.margin)
+        mode_set('EDIT')
+
+        self.report({"INFO"}, f"Moved {moved} islands")
         return {"FINISHED"}
 
 
@@ -286,149 +751,459 @@ class SierraRenamer_OT_Operator(bpy.types.Operator):
     bl_label="renamer"
     bl_description="Rename current objects to the string"
 
+    @lib.profiled_execute("object.sierrarename")
     def execute(self, context):
         scene = context.scene
         mytool = scene.my_tool
-        OBs = bpy.context.selected_objects
-        for i, obj in enumerate(OBs, 1):
-            bpy.context.view_layer.objects.active = obj
-            prefix = "" if mytool.string_prefix == "" else mytool.string_prefix + "_"
-            obj.name = prefix + mytool.string_rename 
-            obj.name += "_" if int(mytool.enum_suffixAction) > 0 else ""
-            
-            if mytool.enum_suffixAction == "1":
-                obj.name += mytool.string_suffix
-            elif mytool.enum_suffixAction == "2":
-                obj.name += str(format(i,f'0{mytool.int_leading + 1}'))
-            elif mytool.enum_suffixAction == "3":
-                obj.name += mytool.string_suffix + str(format(i,f'0{mytool.int_leading + 1}'))
+        kinds = mytool.enum_renameTypes
+
+        # Sort so the numbering does not depend on selection order, digit runs
+        # compare as numbers so a second run keeps the same order
+        if mytool.enum_renameScope == "FILE":
+            OBs = sorted((ob for ob in bpy.data.objects if ob.library is None), key=lambda ob: lib.natural_key(ob.name))
+        else:
+            OBs = sorted(bpy.context.selected_objects, key=lambda ob: lib.natural_key(ob.name))
+
+        batches = []
+        for kind, attr in lib.RENAME_TYPES:
+            if kind not in kinds or kind == "MESHES":
+                continue
+            if mytool.enum_renameScope == "FILE" and kind != "OBJECTS":
+                ids = sorted((id_data for id_data in getattr(bpy.data, attr) if id_data.library is None), key=lambda id_data: lib.natural_key(id_data.name))
+            else:
+                ids = lib.rename_collect(kind, OBs)
+
+            if mytool.bool_useTemplate:
+                try:
+                    names = lib.rename_template_names(ids, mytool.string_template, mytool.string_renameMatch)
+                except ValueError as e:
+                    self.report({"ERROR"}, str(e))
+                    return {"CANCELLED"}
+            else:
+                names = lib.rename_build_names(
+                    len(ids),
+                    mytool.string_prefix,
+                    mytool.string_rename,
+                    mytool.enum_suffixAction,
+                    mytool.string_suffix,
+                    mytool.int_leading,
+                )
+            batches.append((attr, ids, names))
+
+        lib.rename_batches(batches)
+
+        # Mesh data follows the final object names
+        if "MESHES" in kinds:
+            meshes, names = lib.rename_follow_data(OBs)
+            lib.rename_ids(meshes, names, bpy.data.meshes)
 
         return {"FINISHED"}
 
-class ShowConcave_OT_Operator(bpy.types.Operator):
+class SierraProfileReset_OT_Operator(bpy.types.Operator):
+    bl_idname= "object.sierraprofilereset"
+    bl_label="Reset Profile"
+    bl_description="Clears the profiling timers and counters"
+
+    def execute(self, context):
+        lib.profiler.reset()
+        return {"FINISHED"}
+
+class SierraProfileDump_OT_Operator(bpy.types.Operator):
+    bl_idname= "object.sierraprofiledump"
+    bl_label="Dump Profile"
+    bl_description="Writes the profiling timers and counters to a JSON file"
+
+    filepath: bpy.props.StringProperty(subtype="FILE_PATH", default="sierra_profile.json")
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {"RUNNING_MODAL"}
+
+    def execute(self, context):
+        lib.profiler.dump(bpy.path.abspath(self.filepath))
+        self.report({"INFO"}, f"Profile written to {self.filepath}")
+        return {"FINISHED"}
+
+class SierraModalSteps:
+    """Runs the operator's steps() time-sliced from a timer, Esc cancels.
+
+    steps() is a lib step generator that must not write to the scene,
+    finish() applies its result, so cancelling leaves nothing to undo.
+    """
+
+    time_slice = 0.05
+
+    def invoke(self, context, event):
+        self._start = time.perf_counter()
+        self._steps = self.steps(context)
+        wm = context.window_manager
+        wm.progress_begin(0, 100)
+        self._timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return {"RUNNING_MODAL"}
+
+    def modal(self, context, event):
+        if event.type == "ESC":
+            self._steps.close()
+            self.end_modal(context)
+            self.profile_modal()
+            self.report({"INFO"}, "Cancelled")
+            return {"CANCELLED"}
+
+        if event.type != "TIMER":
+            return {"PASS_THROUGH"}
+
+        deadline = time.perf_counter() + self.time_slice
+        try:
+            while time.perf_counter() < deadline:
+                progress, text = next(self._steps)
+        except StopIteration as e:
+            self.end_modal(context)
+            try:
+                return self.finish(context, e.value)
+            finally:
+                self.profile_modal()
+        except Exception as e:
+            # A failed step, e.g. an object deleted mid-run, must not leave
+            # the timer and status text behind
+            self.end_modal(context)
+            self.profile_modal()
+            traceback.print_exc()
+            self.report({"ERROR"}, f"{type(e).__name__}: {e}")
+            return {"CANCELLED"}
+
+        percent = int(progress * 100)
+        context.window_manager.progress_update(percent)
+        context.workspace.status_text_set(f"{text} {percent}%, Esc to cancel")
+        return {"RUNNING_MODAL"}
+
+    def profile_modal(self):
+        # Wall time from invoke to finish, execute() is timed on its own
+        if lib.profiler.enabled:
+            lib.profiler.add_time(f"{self.bl_idname} (modal)", time.perf_counter() - self._start)
+
+    def end_modal(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
+class ShowConcave_OT_Operator(SierraModalSteps, bpy.types.Operator):
     bl_idname= "object.showconcave"
     bl_label="showconcave"
-    bl_description="Flips Normals Of Concave"
+    bl_description="Shows Concave Faces, Optionally Flips Their Normals"
 
+    @lib.profiled_execute("object.showconcave")
     def execute(self, context):
+        return self.finish(context, lib.run_steps(self.steps(context)))
+
+    def steps(self, context):
         OBs = bpy.context.selected_objects
-        mode = context.active_object.mode
         scene = context.scene
         mytool = scene.my_tool
         TOL = mytool.float_concaveTolerance
+
+        tolerance = TOL  # increase to something like .01 or .1 to ignore small concavities
+
         for ob in OBs:
+            if ob.mode == "EDIT":
+                ob.update_from_editmode()
+
+        # Meshes shared between objects are only processed once
+        meshes = list({ob.data: None for ob in OBs if ob.type == "MESH"})
+
+        # Quads and non-convex corners in one array pass per mesh
+        masks = yield from lib.iter_concave_masks(meshes, tolerance)
+
+        return OBs, meshes, masks
+
+    def finish(self, context, result):
+        OBs, meshes, masks = result
+
+        mytool = context.scene.my_tool
+        if not mytool.bool_concaveFlip:
+            # Read-only, nothing is written to the mesh or the undo stack
+            # unless results are stored
+            mesh_masks = dict(zip(meshes, masks))
+            for ob in OBs:
+                if ob.data not in mesh_masks:
+                    continue
+                snapshot = lib.mesh_snapshot(ob, transform=False)
+                concave = mesh_masks[ob.data][snapshot["face_map"]]
+                overlay.show("concave", ob, snapshot["co"], snapshot["tris"][concave])
+            if mytool.bool_storeResults:
+                params = (mytool.float_concaveTolerance,)
+                store_results(context, [(me, "CONCAVE", mask, params) for me, mask in zip(meshes, masks)])
+                # Only an undo step when the mesh was written to
+                undo_push(message="Store Concave Results")
+            return {"FINISHED"}
+
+        overlay.clear("concave")
+        mode = context.active_object.mode
 
-            tolerance = TOL  # increase to something like .01 or .1 to ignore small concavities
+        # One mode switch for the whole batch, the mesh is edited directly
+        mode_set('OBJECT')
+        context.tool_settings.mesh_select_mode = (False, False, True)
 
-            bpy.ops.object.mode_set(mode = 'EDIT') 
-            bpy.ops.mesh.select_mode(type="FACE")
-            bpy.ops.mesh.select_all(action = 'DESELECT')
-            bpy.ops.object.mode_set(mode = 'OBJECT')
+        for me, concave in zip(meshes, masks):
+            # A single normals fix over the concave subset
+            lib.mesh_flip_faces_inside(me, np.flatnonzero(concave))
+            lib.mesh_select_faces(me, concave)
 
-            me = bpy.context.active_object.data
-            me.calc_loop_triangles()
-            poly_i_to_tris = {}
-            for tri in me.loop_triangles:
-                poly_i_to_tris.setdefault(tri.polygon_index, []).append(tri)
-            polys = {}
-            for i, tris in poly_i_to_tris.items():
-                try:
-                    t1, t2 = tris
-                except ValueError:
-                    continue  # not a quad
-                dist = (t1.center - t2.center).length
-                tolerance *= dist  # makes tolerance relative
-                ray_len = dist/2  # making sure to not overshoot, but I don't think it would be possible
-                test1 = t1.center + t1.normal*ray_len
-                test2 = t2.center + t2.normal*ray_len
-                test_dist = (test1 - test2).length
-                if test_dist < dist - tolerance:
-                    # concave
-                    me.polygons[i].select = True
-            bpy.ops.object.mode_set(mode = 'EDIT')
-            bpy.ops.mesh.normals_make_consistent(inside=True)                     
-            bm = bmesh.from_edit_mesh(me)
-            for face in bm.faces:
-                face.select_set(False)
-                for loop in face.loops:
-                    if not loop.is_convex:
-                        face.select_set(True)
-                        bpy.ops.mesh.normals_make_consistent(inside=True)
-                        break
-            
-
-            # bpy.ops.object.mode_set(mode='EDIT')
-            # mesh = ob.data
-
-            
-
-            # # select None
-            # bpy.ops.mesh.select_all(action='DESELECT')
-            # # bm = bmesh.from_edit_mesh(mesh)
-            # # ngons = [f for f in bm.faces if len(f.verts) > 3]
-
-            # ob = bpy.context.edit_object
-            # me = ob.data
-
-            # bm = bmesh.from_edit_mesh(me)
-            # bm.faces.active = None
-
-            # for face in bm.faces:
-            #     face.select_set(False)
-            #     for loop in face.loops:
-            #         if not loop.is_convex:
-            #             face.select_set(True)
-            #             break
-
-            # bmesh.update_edit_mesh(me)
-
-            # for ngon in ngons:
-            #     # define a plane from first 3 points
-            #     co = ngon.verts[0].co
-            #     norm = normal([v.co for v in ngon.verts[:3]])
-
-            #     ngon.select =  not all(
-            #         [(distance_point_to_plane(v.co, co, norm)) < TOL
-            #         for v in ngon.verts[3:]])
-            #     if ngon.select: 
-            #         bpy.ops.mesh.normals_make_consistent(inside=True)
-
-            # for ngon in ngons:
-            # # define a plane from first 3 points
-            #     co = ngon.verts[0].co
-            #     norm = normal([v.co for v in ngon.verts[:3]])
-
-            #     ngon.select =  lib.face_is_distorted(ngon, TOL)
-            #     if ngon.select: 
-            #         bpy.ops.mesh.normals_make_consistent(inside=True)
-
-            # for face in bm.faces:
-            #     face.select_set(False)
-            #     for loop in face.loops:
-            #         if not loop.is_convex:
-            #             face.select_set(True)
-            #             bpy.ops.mesh.normals_make_consistent(inside=True)
-            #             break
-
-            # bm.free()
-
-
-            # bmesh.update_edit_mesh(mesh)
-            bpy.ops.object.mode_set(mode='OBJECT')
-        bpy.ops.object.mode_set(mode=mode)
-        bpy.context.space_data.overlay.show_face_orientation = True
+        mode_set(mode)
+
+        # No 3D view when running in the background
+        space = context.space_data
+        if space is not None and space.type == "VIEW_3D":
+            space.overlay.show_face_orientation = True
+        undo_push(message="Flip Concave Faces")
         return{'FINISHED'}
 
+class SierraClearOverlay_OT_Operator(bpy.types.Operator):
+    bl_idname= "object.sierraclearoverlay"
+    bl_label="Clear Overlay"
+    bl_description="Hides the flagged face overlay"
+
+    def execute(self, context):
+        overlay.clear()
+        return {"FINISHED"}
+
+class SierraMeshCheck_OT_Operator(SierraModalSteps, bpy.types.Operator):
+    bl_idname= "object.sierrameshcheck"
+    bl_label="Mesh Check"
+    bl_description="Selects faces that are too thin, intersect or are not flat"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    check: bpy.props.EnumProperty(
+        items=[
+            ("THICKNESS", "Thickness", "Faces closer than the thickness to the opposite side"),
+            ("SELF_INTERSECT", "Self Intersection", "Faces that intersect other faces of the mesh, or of other selected meshes"),
+            ("DISTORTED", "Distorted", "Faces that are not flat within the distortion angle"),
+        ],
+        name="Check",
+    )
+
+    @classmethod
+    def poll(cls, context):
+        # finish() switches modes through the active object
+        return context.active_object is not None and any(ob.type == "MESH" for ob in context.selected_objects)
+
+    @lib.profiled_execute("object.sierrameshcheck")
+    def execute(self, context):
+        return self.finish(context, lib.run_steps(self.steps(context)))
+
+    def steps(self, context):
+        mytool = context.scene.my_tool
+        OBs = [ob for ob in context.selected_objects if ob.type == "MESH"]
+
+        if mytool.bool_tiled and not (self.check == "SELF_INTERSECT" and mytool.bool_interObject):
+            results = []
+            for i, ob in enumerate(OBs):
+                start, end = i / len(OBs), (i + 1) / len(OBs)
+                steps = lib.iter_mesh_health(
+                    ob,
+                    {self.check},
+                    angle_distort=mytool.float_distortAngle,
+                    thickness=mytool.float_thickness,
+                    budget=tile_budget(mytool),
+                )
+                row, masks = yield from lib.iter_scaled(steps, start, end)
+                results.append((ob, np.flatnonzero(masks[self.check])))
+            return results
+
+        if self.check == "DISTORTED":
+            results = []
+            for i, ob in enumerate(OBs):
+                yield i / len(OBs), f"Distortion {ob.name}"
+                faces = stored_faces(ob, self.check, self.params(context, ob))
+                if faces is None:
+                    faces = lib.mesh_check_distorted_object(ob, mytool.float_distortAngle)
+                results.append((ob, faces))
+            return results
+
+        if self.check == "SELF_INTERSECT":
+            faces = yield from lib.iter_check_intersect_objects(OBs, mytool.bool_interObject)
+            return [(ob, faces[ob.name]) for ob in OBs if ob.name in faces]
+
+        results = []
+        for i, ob in enumerate(OBs):
+            start, end = i / len(OBs), (i + 1) / len(OBs)
+            faces = stored_faces(ob, self.check, self.params(context, ob))
+            if faces is None:
+                steps = lib.iter_check_thick_object(ob, mytool.float_thickness)
+                faces = yield from lib.iter_scaled(steps, start, end)
+            results.append((ob, faces))
+
+        return results
+
+    def params(self, context, ob):
+        mytool = context.scene.my_tool
+        return lib.health_params(ob, self.check, angle_distort=mytool.float_distortAngle, thickness=mytool.float_thickness)
+
+    def finish(self, context, results):
+        mytool = context.scene.my_tool
+        mode = context.active_object.mode
+        mode_set('OBJECT')
+        context.tool_settings.mesh_select_mode = (False, False, True)
+
+        # Hits against other objects depend on more than this mesh, not stored
+        store = mytool.bool_storeResults and not (self.check == "SELF_INTERSECT" and mytool.bool_interObject)
+
+        total = 0
+        for ob, faces in results:
+            mask = np.zeros(len(ob.data.polygons), dtype=bool)
+            mask[np.asarray(faces, dtype=np.int64)] = True
+            lib.mesh_select_faces(ob.data, mask)
+            if store:
+                lib.mesh_store_result(ob.data, self.check, mask, self.params(context, ob))
+            total += len(faces)
+
+        mode_set(mode)
+        self.report({"INFO"}, f"{total} faces found")
+        return {"FINISHED"}
+
+
+class SierraMeshHealth_OT_Operator(SierraModalSteps, bpy.types.Operator):
+    bl_idname= "object.sierrahealth"
+    bl_label="Mesh Health"
+    bl_description="Runs the enabled checks on one read of each selected mesh and lists the results"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @lib.profiled_execute("object.sierrahealth")
+    def execute(self, context):
+        return self.finish(context, lib.run_steps(self.steps(context)))
+
+    def steps(self, context):
+        mytool = context.scene.my_tool
+        OBs = [ob for ob in context.selected_objects if ob.type == "MESH" and ob.data.polygons]
+
+        # One depsgraph walk for the whole selection. Each evaluated mesh is
+        # read when its turn comes and its arrays are dropped once checked,
+        # so only one object's arrays are held at a time
+        evaluated = [ob for ob in OBs if ob.modifiers] if mytool.bool_applyModifiers else []
+        names = {ob.name for ob in evaluated}
+        pending = [(ob, None) for ob in OBs if ob.name not in names]
+        order = {ob.name: i for i, ob in enumerate(OBs)}
+
+        rows = []
+        results = []
+        for i, (ob, arrays) in enumerate(itertools.chain(pending, lib.iter_evaluated_mesh_arrays(evaluated))):
+            start, end = i / len(OBs), (i + 1) / len(OBs)
+            steps = lib.iter_mesh_health(
+                ob,
+                mytool.enum_healthChecks,
+                mytool.float_concaveTolerance,
+                mytool.float_distortAngle,
+                mytool.float_thickness,
+                budget=tile_budget(mytool),
+                arrays=arrays,
+            )
+            arrays = None
+            row, masks = yield from lib.iter_scaled(steps, start, end)
+            rows.append(row)
+            # Faces of an evaluated mesh do not match the stored mesh
+            if ob.name in names:
+                continue
+            for check, mask in masks.items():
+                params = lib.health_params(ob, check, mytool.float_concaveTolerance, mytool.float_distortAngle, mytool.float_thickness)
+                results.append((ob.data, check, mask, params))
+
+        # Evaluated objects come in depsgraph order, list them as selected
+        rows.sort(key=lambda row: order[row["object"]])
+        return rows, results
+
+    def finish(self, context, result):
+        rows, results = result
+        health_rows[:] = rows
+        if context.scene.my_tool.bool_storeResults:
+            store_results(context, results)
+        context.scene.my_tool.bool_showHealth = True
+        flagged = sum(1 for row in rows if any(row[name] for name, text in HEALTH_COLUMNS))
+        self.report({"INFO"}, f"{flagged} of {len(rows)} objects have flagged faces")
+        return {"FINISHED"}
+
+class SierraResultDiff_OT_Operator(bpy.types.Operator):
+    bl_idname= "object.sierraresultdiff"
+    bl_label="Diff Results"
+    bl_description="Highlights faces whose stored check result changed since the previous run"
+
+    check: bpy.props.EnumProperty(
+        items=[
+            ("CONCAVE", "Concave", ""),
+            ("DISTORTED", "Distorted", ""),
+            ("SELF_INTERSECT", "Self Intersection", ""),
+            ("THICKNESS", "Thickness", ""),
+        ],
+        name="Check",
+    )
+
+    @lib.profiled_execute("object.sierraresultdiff")
+    def execute(self, context):
+        overlay.clear("diff")
+
+        total = 0
+        for ob in context.selected_objects:
+            if ob.type != "MESH":
+                continue
+            if ob.mode == "EDIT":
+                ob.update_from_editmode()
+            changed = lib.mesh_result_diff(ob.data, self.check)
+            if changed is None or not changed.any():
+                continue
+            snapshot = lib.mesh_snapshot(ob, transform=False)
+            overlay.show("diff", ob, snapshot["co"], snapshot["tris"][changed[snapshot["face_map"]]])
+            total += int(np.count_nonzero(changed))
+
+        self.report({"INFO"}, f"{total} faces changed")
+        return {"FINISHED"}
+
+class SierraHealthExport_OT_Operator(bpy.types.Operator):
+    bl_idname= "object.sierrahealthexport"
+    bl_label="Export Health"
+    bl_description="Writes the mesh health report to a CSV or JSON file"
+
+    filepath: bpy.props.StringProperty(subtype="FILE_PATH", default="sierra_health.csv")
+
+    @classmethod
+    def poll(cls, context):
+        return bool(health_rows)
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {"RUNNING_MODAL"}
+
+    def execute(self, context):
+        lib.write_table(health_rows, bpy.path.abspath(self.filepath))
+        self.report({"INFO"}, f"Health report written to {self.filepath}")
+        return {"FINISHED"}
 
 
-classes = (SierraSettings, SierraRenamer_OT_Operator, Renamer_PT_Panel, SierraUV_PT_Panel, ShowConcave_OT_Operator, SierraStackUnstack_OT_Operator, SierraToggleUVLines_OT_Operator, SierraToggleCrease_OT_Operator)
+classes = (SierraSettings, SierraRenamer_OT_Operator, Renamer_PT_Panel, SierraUV_PT_Panel, ShowConcave_OT_Operator, SierraStackUnstack_OT_Operator, SierraToggleUVLines_OT_Operator, SierraToggleCrease_OT_Operator, SierraProfileReset_OT_Operator, SierraProfileDump_OT_Operator, SierraMeshCheck_OT_Operator, SierraClearOverlay_OT_Operator, SierraMeshHealth_OT_Operator, SierraHealthExport_OT_Operator, SierraResultDiff_OT_Operator)
 
 def register():
     for cls in classes:
         bpy.utils.register_class(cls)
     bpy.types.Scene.my_tool = bpy.props.PointerProperty(type=SierraSettings)
+    bpy.app.handlers.depsgraph_update_post.append(live_concave_depsgraph)
+    bpy.app.handlers.load_post.append(sync_settings_load)
+    # The context is restricted while registering
+    bpy.app.timers.register(sync_settings, first_interval=0.0)
+    overlay.register()
 
 def unregister():
+    if live_concave_depsgraph in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(live_concave_depsgraph)
+    if sync_settings_load in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(sync_settings_load)
+    if bpy.app.timers.is_registered(sync_settings):
+        bpy.app.timers.unregister(sync_settings)
+    if bpy.app.timers.is_registered(live_concave_flush):
+        bpy.app.timers.unregister(live_concave_flush)
+    live_state.clear()
+    live_dirty.clear()
+    health_rows.clear()
+    overlay.unregister()
+    lib.analysis_cache.clear()
     del bpy.types.Scene.my_tool
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
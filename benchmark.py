@@ -0,0 +1,310 @@
+# Headless benchmarks for the Sierra operators and lib helpers.
+#
+# Run with Blender:
+#   blender --background --factory-startup --python benchmark.py -- --output bench.json
+# or with the bpy wheel:
+#   python benchmark.py --output bench.json
+#
+# Every case is timed on freshly generated data and the analysis cache is
+# cleared before each run, so the numbers are cold timings. Each case runs in
+# its own process, so its peak resident size is not inflated by earlier cases.
+
+import argparse
+import importlib
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import bmesh
+import bpy
+import numpy as np
+
+
+def import_addon():
+    path = os.path.dirname(os.path.abspath(__file__))
+    parent, name = os.path.split(path)
+    if parent not in sys.path:
+        sys.path.insert(0, parent)
+
+    addon = importlib.import_module(name)
+    try:
+        addon.register()
+    except ValueError:
+        # Already installed and enabled
+        pass
+
+    return addon
+
+
+def peak_memory_mb():
+    # Peak resident size of this process so far, includes Blender's own
+    # allocations
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+# Scene generation
+# -------------------------------------
+
+
+def reset_scene():
+    if bpy.context.object is not None and bpy.context.object.mode != "OBJECT":
+        bpy.ops.object.mode_set(mode="OBJECT")
+
+    for ob in list(bpy.data.objects):
+        bpy.data.objects.remove(ob)
+    for me in list(bpy.data.meshes):
+        bpy.data.meshes.remove(me)
+
+
+def make_grid_mesh(name, faces, noise=0.25, seed=0):
+    """Quad grid with about ``faces`` faces, z jitter makes some quads concave."""
+
+    side = max(1, round(math.sqrt(faces)))
+
+    bm = bmesh.new()
+    bmesh.ops.create_grid(bm, x_segments=side, y_segments=side, size=side * 0.5)
+    me = bpy.data.meshes.new(name)
+    bm.to_mesh(me)
+    bm.free()
+
+    co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+    me.vertices.foreach_get("co", co)
+    rng = np.random.default_rng(seed)
+    co[2::3] = rng.uniform(-noise, noise, len(me.vertices))
+    me.vertices.foreach_set("co", co)
+    me.update()
+
+    return me
+
+
+def make_object(me, name=None):
+    ob = bpy.data.objects.new(name or me.name, me)
+    bpy.context.scene.collection.objects.link(ob)
+    return ob
+
+
+def select_only(objects, active=None):
+    for ob in bpy.context.view_layer.objects:
+        ob.select_set(False)
+    for ob in objects:
+        ob.select_set(True)
+    bpy.context.view_layer.objects.active = active or (objects[0] if objects else None)
+
+
+# Cases
+# -------------------------------------
+
+
+def case_rename(lib, count, faces):
+    me = make_grid_mesh("bench", 1)
+    objects = [make_object(me, f"bench_{i}") for i in range(count)]
+    select_only(objects)
+
+    def reset():
+        # A second rename to the same names writes nothing, start from the
+        # original names every run. Two passes, so no name is still held by
+        # another object when it is assigned
+        for i, ob in enumerate(objects):
+            ob.name = f"bench_reset_{i}"
+        for i, ob in enumerate(objects):
+            ob.name = f"bench_{i}"
+
+    def run():
+        bpy.ops.object.sierrarename()
+
+    run.reset = reset
+    return run
+
+
+def case_showconcave(lib, count, faces):
+    objects = [make_object(make_grid_mesh(f"bench_{i}", faces, seed=i)) for i in range(count)]
+    select_only(objects)
+
+    def run():
+        lib.analysis_cache.clear()
+        bpy.ops.object.showconcave()
+
+    return run
+
+
+def case_togglecrease(lib, count, faces):
+    objects = [make_object(make_grid_mesh(f"bench_{i}", faces, seed=i)) for i in range(count)]
+    for ob in objects:
+        ob.data.edges.foreach_set("select", np.ones(len(ob.data.edges), dtype=bool))
+    select_only(objects)
+    bpy.ops.object.mode_set(mode="EDIT")
+
+    def run():
+        bpy.ops.object.sierratogglecrease()
+
+    return run
+
+
+def case_thick(lib, count, faces):
+    objects = [make_object(make_grid_mesh(f"bench_{i}", faces, seed=i)) for i in range(count)]
+
+    def run():
+        lib.analysis_cache.clear()
+        for ob in objects:
+            lib.bmesh_check_thick_object(ob, 0.1)
+
+    return run
+
+
+def case_self_intersect(lib, count, faces):
+    objects = [make_object(make_grid_mesh(f"bench_{i}", faces, seed=i)) for i in range(count)]
+
+    def run():
+        lib.analysis_cache.clear()
+        for ob in objects:
+            lib.bmesh_check_self_intersect_object(ob)
+
+    return run
+
+
+# name: (setup, scales with object count, scales with face count)
+CASES = {
+    "object.sierrarename": (case_rename, True, False),
+    "object.showconcave": (case_showconcave, False, True),
+    "object.sierratogglecrease": (case_togglecrease, False, True),
+    "lib.bmesh_check_thick_object": (case_thick, False, True),
+    "lib.bmesh_check_self_intersect_object": (case_self_intersect, False, True),
+}
+
+
+def run_case(lib, name, count, faces, repeat):
+    setup, _by_count, _by_faces = CASES[name]
+
+    reset_scene()
+    # Startup and add-on registration, before the case allocates anything
+    baseline = peak_memory_mb()
+    run = setup(lib, count, faces)
+
+    times = []
+    for _ in range(repeat):
+        # Untimed per run setup, e.g. restoring renamed objects
+        reset = getattr(run, "reset", None)
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    peak = peak_memory_mb()
+    reset_scene()
+
+    return {
+        "case": name,
+        "objects": count,
+        "faces": faces,
+        "repeat": repeat,
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "process_peak_rss_mb": peak,
+        "baseline_rss_mb": baseline,
+        "case_peak_rss_mb": None if peak is None else peak - baseline,
+    }
+
+
+def worker_command():
+    # The bpy wheel has no Blender binary, re-run the script with Python
+    if bpy.app.binary_path:
+        return [bpy.app.binary_path, "--background", "--factory-startup", "--python", os.path.abspath(__file__), "--"]
+    return [sys.executable, os.path.abspath(__file__)]
+
+
+def run_case_process(name, count, faces, repeat):
+    """run_case() in a fresh process, so the peak memory is of this case only."""
+
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        subprocess.run(
+            worker_command() + [
+                "--worker",
+                "--cases", name,
+                "--objects", str(count),
+                "--faces", str(faces),
+                "--repeat", str(repeat),
+                "--output", path,
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        with open(path) as f:
+            return json.load(f)
+    finally:
+        os.remove(path)
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="Benchmark Sierra operators and lib helpers")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=sorted(CASES))
+    parser.add_argument("--objects", nargs="+", type=int, default=[1000, 10000, 100000],
+                        help="object counts for cases that scale with the selection")
+    parser.add_argument("--faces", nargs="+", type=int, default=[10000, 100000, 1000000, 10000000],
+                        help="face counts for cases that scale with mesh size")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="JSON file, printed to stdout when omitted")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    addon = import_addon()
+
+    if args.worker:
+        result = run_case(addon.lib, args.cases[0], args.objects[0], args.faces[0], args.repeat)
+        with open(args.output, "w") as f:
+            json.dump(result, f)
+        return
+
+    results = []
+    for name in args.cases:
+        _setup, by_count, by_faces = CASES[name]
+        counts = args.objects if by_count else [1]
+        faces = args.faces if by_faces else [1]
+
+        for count in counts:
+            for face_count in faces:
+                result = run_case_process(name, count, face_count, args.repeat)
+                results.append(result)
+                print(f"{name:40} objects={count:<7} faces={face_count:<9} {result['min_s']:.4f}s", file=sys.stderr)
+
+    report = {
+        "blender": bpy.app.version_string,
+        "addon": ".".join(map(str, addon.bl_info["version"])),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
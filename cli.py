@@ -0,0 +1,260 @@
+# Batch mode: run renames and mesh checks over many .blend files without the UI.
+#
+# Driver, plain Python, starts one background Blender per file:
+#   python cli.py "assets/**/*.blend" --profile nightly.json --jobs 8 --report report.json
+#
+# Worker, started by the driver inside Blender:
+#   blender --background file.blend --python cli.py -- --worker --profile nightly.json --report out.json
+#
+# The profile is a JSON object, missing keys fall back to DEFAULT_PROFILE.
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+DEFAULT_PROFILE = {
+    # Rename, same settings as the panel
+    "rename": False,
+    "rename_types": ["MESH"],
+    "prefix": "SM",
+    "name": "object",
+    "suffix_action": "2",
+    "suffix": "X",
+    "leading": 1,
+    "save": False,
+    # Checks
+    "checks": ["concave", "thickness", "self_intersect"],
+    "concave_tolerance": 0.0,
+    "thickness": 0.01,
+    # Radians
+    "distort_angle": 0.0872665,
+}
+
+
+def load_profile(path):
+    profile = dict(DEFAULT_PROFILE)
+    if path:
+        with open(path) as f:
+            profile.update(json.load(f))
+
+    unknown = set(profile) - set(DEFAULT_PROFILE)
+    if unknown:
+        raise ValueError(f"Unknown profile keys: {', '.join(sorted(unknown))}")
+
+    return profile
+
+
+# Worker
+# -------------------------------------
+
+
+def import_addon():
+    import importlib
+
+    path = os.path.dirname(os.path.abspath(__file__))
+    parent, name = os.path.split(path)
+    if parent not in sys.path:
+        sys.path.insert(0, parent)
+
+    addon = importlib.import_module(name)
+    try:
+        addon.register()
+    except ValueError:
+        # Already installed and enabled
+        pass
+
+    return addon
+
+
+def run_rename(lib, profile):
+    import bpy
+
+    types = set(profile["rename_types"])
+    objects = sorted((ob for ob in bpy.data.objects if ob.type in types and ob.library is None), key=lambda ob: ob.name)
+
+    names = lib.rename_build_names(
+        len(objects),
+        profile["prefix"],
+        profile["name"],
+        profile["suffix_action"],
+        profile["suffix"],
+        profile["leading"],
+    )
+    old = [ob.name for ob in objects]
+    new = lib.rename_ids(objects, names, bpy.data.objects)
+
+    return {a: b for a, b in zip(old, new) if a != b}
+
+
+def run_checks(lib, profile):
+    import bpy
+
+    checks = set(profile["checks"])
+    results = []
+
+    for ob in bpy.data.objects:
+        if ob.type != "MESH" or not ob.data.polygons:
+            continue
+
+        row = {"object": ob.name, "faces": len(ob.data.polygons)}
+
+        if "concave" in checks:
+            start = time.perf_counter()
+            arrays = lib.mesh_concave_arrays(ob.data)
+            row["concave"] = int(lib.concave_face_mask(arrays, profile["concave_tolerance"]).sum())
+            row["concave_s"] = time.perf_counter() - start
+
+        if "thickness" in checks:
+            start = time.perf_counter()
+            row["thickness"] = len(lib.bmesh_check_thick_object(ob, profile["thickness"]))
+            row["thickness_s"] = time.perf_counter() - start
+
+        if "distorted" in checks:
+            start = time.perf_counter()
+            row["distorted"] = len(lib.mesh_check_distorted_object(ob, profile["distort_angle"]))
+            row["distorted_s"] = time.perf_counter() - start
+
+        if "self_intersect" in checks:
+            start = time.perf_counter()
+            row["self_intersect"] = len(lib.bmesh_check_self_intersect_object(ob))
+            row["self_intersect_s"] = time.perf_counter() - start
+
+        results.append(row)
+
+    return results
+
+
+def worker(args):
+    import bpy
+
+    profile = load_profile(args.profile)
+    lib = import_addon().lib
+
+    report = {"file": bpy.data.filepath}
+    if profile["rename"]:
+        report["renamed"] = run_rename(lib, profile)
+    report["objects"] = run_checks(lib, profile)
+
+    if profile["rename"] and profile["save"] and report["renamed"]:
+        bpy.ops.wm.save_mainfile()
+        report["saved"] = True
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+# Driver
+# -------------------------------------
+
+
+def expand_files(patterns):
+    files = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            files.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            files.append(pattern)
+
+    # Keep order, drop duplicates
+    return list(dict.fromkeys(os.path.abspath(f) for f in files if f.endswith(".blend")))
+
+
+def run_file(blender, filepath, profile, timeout):
+    import subprocess
+    import tempfile
+
+    fd, report_path = tempfile.mkstemp(suffix=".json", prefix="sierra_")
+    os.close(fd)
+
+    cmd = [blender, "--background", "--factory-startup", filepath, "--python", os.path.abspath(__file__), "--", "--worker", "--report", report_path]
+    if profile:
+        cmd += ["--profile", os.path.abspath(profile)]
+
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        with open(report_path) as f:
+            report = json.load(f) if proc.returncode == 0 and os.path.getsize(report_path) else None
+        error = None if report is not None else (proc.stderr or proc.stdout)[-2000:]
+    except subprocess.TimeoutExpired:
+        report, error = None, f"Timed out after {timeout}s"
+    except OSError as e:
+        report, error = None, str(e)
+    finally:
+        os.remove(report_path)
+
+    if report is None:
+        report = {"file": filepath, "error": error}
+    report["seconds"] = time.perf_counter() - start
+
+    return report
+
+
+def driver(args):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Validate before starting any Blender
+    load_profile(args.profile)
+
+    files = expand_files(args.files)
+    if not files:
+        print("No .blend files found", file=sys.stderr)
+        return 1
+
+    # Each job is a separate Blender process, threads only wait on them
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        jobs = [pool.submit(run_file, args.blender, f, args.profile, args.timeout) for f in files]
+        reports = []
+        for i, job in enumerate(jobs, 1):
+            report = job.result()
+            reports.append(report)
+            status = "FAILED" if "error" in report else "ok"
+            print(f"[{i}/{len(files)}] {status} {report['file']}", file=sys.stderr)
+
+    summary = {
+        "files": len(reports),
+        "failed": sum("error" in report for report in reports),
+        "reports": reports,
+    }
+
+    text = json.dumps(summary, indent=2)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    return 1 if summary["failed"] else 0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Run Sierra renames and mesh checks over .blend files")
+    parser.add_argument("files", nargs="*", help=".blend files or glob patterns")
+    parser.add_argument("--profile", help="JSON settings profile")
+    parser.add_argument("--report", help="JSON report path, printed to stdout when omitted")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"), help="Blender executable")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Blender instances run at once")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds per file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+
+    return parser.parse_args(argv)
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    args = parse_args(argv)
+
+    if args.worker:
+        worker(args)
+        return 0
+
+    return driver(args)
+
+
+if __name__ == "__main__":
+    code = main()
+    if code:
+        sys.exit(code)
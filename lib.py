@@ -5,8 +5,13 @@
 # Generic helper functions, to be used by any modules.
 
 
+import functools
+import itertools
+import re
+
 import bmesh
 import bpy
+import numpy as np
 
 
 def clean_float(value: float, precision: int = 0) -> str:
@@ -24,12 +29,582 @@ def clean_float(value: float, precision: int = 0) -> str:
     return text
 
 
+# Profiling
+# -------------------------------------
+
+
+class Profiler:
+    """Opt-in timers and counters for the operators and helpers.
+
+    Disabled it costs a single attribute check per call.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.timings = {}
+        self.counters = {}
+
+    def reset(self):
+        self.timings.clear()
+        self.counters.clear()
+
+    def count(self, name: str, amount: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name: str, seconds: float):
+        calls, total, peak = self.timings.get(name, (0, 0.0, 0.0))
+        self.timings[name] = (calls + 1, total + seconds, max(peak, seconds))
+
+    def report(self) -> dict:
+        return {
+            "timings": {
+                name: {"calls": calls, "total_s": total, "max_s": peak}
+                for name, (calls, total, peak) in sorted(self.timings.items(), key=lambda item: -item[1][1])
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def dump(self, filepath: str):
+        import json
+
+        with open(filepath, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+profiler = Profiler()
+
+
+def profiled(name: str):
+    """Decorator timing every call to the wrapped function under ``name``."""
+    import functools
+    import time
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.add_time(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def profiled_execute(name: str):
+    """profiled() for Operator.execute, Blender checks the argument count."""
+    import functools
+    import time
+
+    def decorator(func):
+        @functools.wraps(func)
+        def execute(self, context):
+            if not profiler.enabled:
+                return func(self, context)
+
+            start = time.perf_counter()
+            try:
+                return func(self, context)
+            finally:
+                profiler.add_time(name, time.perf_counter() - start)
+
+        return execute
+
+    return decorator
+
+
+# Steps
+# -------------------------------------
+
+# Long checks are written as generators yielding (progress, text) between
+# chunks of work and returning their result, so the same code can run to the
+# end in one go or time-sliced from a modal operator.
+
+
+def run_steps(steps):
+    """Run a step generator to the end, returns its result."""
+
+    while True:
+        try:
+            next(steps)
+        except StopIteration as e:
+            return e.value
+
+
+def iter_scaled(steps, start, end):
+    """Re-map the progress of ``steps`` into ``start`` .. ``end``."""
+
+    try:
+        while True:
+            try:
+                progress, text = next(steps)
+            except StopIteration as e:
+                return e.value
+            yield start + (end - start) * progress, text
+    finally:
+        steps.close()
+
+
+# Rename
+# -------------------------------------
+
+
+# Blender stores ID names in a 64 byte buffer, including the terminator.
+MAX_NAME_BYTES = 63
+
+
+def clip_name(name: str, limit: int = MAX_NAME_BYTES) -> str:
+    # Truncate on a utf-8 boundary the same way Blender does on assignment
+
+    data = name.encode("utf-8")
+    if len(data) <= limit:
+        return name
+
+    return data[:limit].decode("utf-8", "ignore")
+
+
+_DIGITS = re.compile(r"(\d+)")
+
+
+def natural_key(name):
+    """Sort key comparing digit runs as numbers, so ``a_99`` comes before ``a_100``."""
+
+    parts = _DIGITS.split(name)
+    parts[1::2] = map(int, parts[1::2])
+    return tuple(parts), name
+
+
+def rename_build_names(count, prefix, name, suffix_action, suffix="", leading=1):
+    """Returns the prefix_name_suffix+number names for a batch of ``count`` ids."""
+
+    head = "" if prefix == "" else prefix + "_"
+    head += name
+    head += "_" if int(suffix_action) > 0 else ""
+
+    if suffix_action in {"1", "3"}:
+        head += suffix
+
+    if suffix_action in {"2", "3"}:
+        width = leading + 1
+        return [head + format(i, f"0{width}") for i in range(1, count + 1)]
+
+    return [head] * count
+
+
+_TEMPLATE_TOKEN = re.compile(r"\{\{|\}\}|\{([^{}]*)\}")
+
+
+def _template_getter(token, regex):
+    # Returns a function (id, index, match) -> str for one template token
+
+    if token == "name":
+        return lambda id_data, index, match: id_data.name
+
+    if token == "collection":
+        def get_collection(id_data, index, match):
+            collections = getattr(id_data, "users_collection", ())
+            return collections[0].name if collections else ""
+        return get_collection
+
+    if token == "type":
+        return lambda id_data, index, match: getattr(id_data, "type", type(id_data).__name__)
+
+    if token == "polys":
+        def get_polys(id_data, index, match):
+            me = id_data.data if getattr(id_data, "type", "") == "MESH" else id_data
+            polygons = getattr(me, "polygons", None)
+            return str(len(polygons)) if polygons is not None else "0"
+        return get_polys
+
+    if token == "counter" or token.startswith("counter:"):
+        try:
+            width, start, step = ([int(x) for x in token.split(":")[1:]] + [1, 1, 1])[:3]
+        except ValueError:
+            raise ValueError(f"Counter takes whole numbers: {{{token}}}") from None
+        spec = f"0{width}d"
+        return lambda id_data, index, match: format(start + index * step, spec)
+
+    if token.startswith("g:"):
+        group = token[2:]
+        if regex is None or group not in regex.groupindex:
+            raise ValueError(f"No group named '{group}' in the match pattern")
+        return lambda id_data, index, match: (match.group(group) or "") if match else ""
+
+    if token[:1] == "g" and token[1:].isdigit():
+        group = int(token[1:])
+        if regex is None or group > regex.groups:
+            raise ValueError(f"No group {group} in the match pattern")
+        return lambda id_data, index, match: (match.group(group) or "") if match else ""
+
+    raise ValueError(f"Unknown token {{{token}}}")
+
+
+@functools.lru_cache(maxsize=32)
+def compile_name_template(template, pattern=""):
+    """Compile a rename template once into a function (id, index) -> name.
+
+    Tokens: {name}, {collection}, {type}, {polys},
+    {counter[:pad[:start[:step]]]} and {g1}, {g:group} for groups of
+    ``pattern`` matched against the original name. {{ and }} are literal.
+    Raises ValueError for a bad template or pattern.
+    """
+
+    try:
+        regex = re.compile(pattern) if pattern else None
+    except re.error as e:
+        raise ValueError(f"Invalid match pattern: {e}") from None
+
+    fmt = []
+    getters = []
+    pos = 0
+    for m in _TEMPLATE_TOKEN.finditer(template):
+        text = template[pos:m.start()]
+        if "{" in text or "}" in text:
+            raise ValueError("Unmatched brace in template")
+        fmt.append(text)
+        pos = m.end()
+
+        if m.group(1) is None:
+            fmt.append(m.group(0))
+        else:
+            getters.append(_template_getter(m.group(1).strip(), regex))
+            fmt.append("{}")
+
+    text = template[pos:]
+    if "{" in text or "}" in text:
+        raise ValueError("Unmatched brace in template")
+    fmt.append(text)
+    format_string = "".join(fmt)
+
+    def format_name(id_data, index):
+        match = regex.search(id_data.name) if regex is not None else None
+        return format_string.format(*[get(id_data, index, match) for get in getters])
+
+    return format_name
+
+
+def rename_template_names(ids, template, pattern=""):
+    """Returns the template names for ``ids``, numbered in the given order."""
+
+    format_name = compile_name_template(template, pattern)
+    return [format_name(id_data, i) for i, id_data in enumerate(ids)]
+
+
+# Numeric suffix Blender strips before numbering a clashing name.
+_NAME_NUMBER = re.compile(r"\.\d+$")
+
+
+def rename_resolve_names(names, taken):
+    """Make every name unique against ``taken`` and each other.
+
+    Collisions get the same ``.001`` style suffix Blender would add, replacing
+    any number the name already ends in (a clashing ``a.001`` becomes
+    ``a.002``), but are resolved in list order so the result does not depend
+    on assignment order. ``taken`` is updated in place with the resolved names.
+    """
+
+    resolved = []
+    counters = {}
+
+    for name in names:
+        name = clip_name(name)
+
+        if name in taken:
+            base = _NAME_NUMBER.sub("", name)
+            number = counters.get(base, 0)
+            while True:
+                number += 1
+                tail = f".{number:03d}"
+                name = clip_name(base, MAX_NAME_BYTES - len(tail)) + tail
+                if name not in taken:
+                    break
+            counters[base] = number
+
+        taken.add(name)
+        resolved.append(name)
+
+    return resolved
+
+
+@profiled("lib.rename_ids")
+def rename_ids(ids, names, collection):
+    """Rename ``ids`` (all members of ``collection``) to the matching ``names``.
+
+    Names are resolved against an index of ``collection`` up front, then each
+    id is written once. Ids holding a name another id in the batch needs are
+    moved to a temporary name first, so Blender never has to make a final
+    name unique on its own. Returns the resolved names.
+    """
+
+    ids = list(ids)
+    batch = {id_data.name for id_data in ids}
+    taken = {id_data.name for id_data in collection} - batch
+    targets = rename_resolve_names(names, taken)
+
+    wanted = set(targets)
+    pending = []
+
+    for id_data, target in zip(ids, targets):
+        if id_data.name == target:
+            continue
+        pending.append((id_data, target))
+
+    taken |= batch
+    tmp_names = (f"~sierra~{i}" for i in itertools.count())
+
+    def tmp_name():
+        for name in tmp_names:
+            if name not in taken:
+                return name
+
+    originals = [(id_data, id_data.name) for id_data, target in pending]
+    try:
+        # Phase 1: free up any current name that is also a target.
+        for id_data, target in pending:
+            if id_data.name in wanted:
+                id_data.name = tmp_name()
+
+        # Phase 2: every target is now free.
+        for id_data, target in pending:
+            id_data.name = target
+    except Exception:
+        # Put the batch back the same way, so no id keeps a temporary name
+        moved = [(id_data, name) for id_data, name in originals if id_data.name != name]
+        for id_data, name in moved:
+            id_data.name = tmp_name()
+        for id_data, name in moved:
+            id_data.name = name
+        raise
+
+    return targets
+
+
+# Datablock types the renamer can batch, with their bpy.data collection.
+# Objects come first so data that follows its object sees the final names.
+RENAME_TYPES = (
+    ("OBJECTS", "objects"),
+    ("MESHES", "meshes"),
+    ("MATERIALS", "materials"),
+    ("COLLECTIONS", "collections"),
+    ("IMAGES", "images"),
+    ("ACTIONS", "actions"),
+)
+
+
+def _unique(ids):
+    # Drops duplicates and linked ids, which can not be renamed, keeps order
+    seen = set()
+    result = []
+    for id_data in ids:
+        if id_data is None or id_data.library is not None:
+            continue
+        key = id_data.as_pointer()
+        if key in seen:
+            continue
+        seen.add(key)
+        result.append(id_data)
+    return result
+
+
+def rename_collect(kind, objects):
+    """Returns the ids of ``kind`` used by ``objects``, in first use order."""
+
+    if kind == "OBJECTS":
+        return _unique(objects)
+
+    if kind == "MESHES":
+        return _unique(ob.data for ob in objects if ob.type == "MESH")
+
+    if kind == "MATERIALS":
+        return _unique(slot.material for ob in objects for slot in ob.material_slots)
+
+    if kind == "COLLECTIONS":
+        # The scene collection is embedded in the scene and can not be renamed
+        return _unique(coll for ob in objects for coll in ob.users_collection if not coll.is_embedded_data)
+
+    if kind == "IMAGES":
+        images = []
+        for mat in rename_collect("MATERIALS", objects):
+            if mat.node_tree is None:
+                continue
+            images += [node.image for node in mat.node_tree.nodes if node.type == "TEX_IMAGE"]
+        return _unique(images)
+
+    if kind == "ACTIONS":
+        return _unique(ob.animation_data.action for ob in objects if ob.animation_data is not None)
+
+    raise ValueError(f"Unknown datablock type {kind}")
+
+
+def rename_follow_data(objects):
+    """Returns (meshes, names) so each mesh takes the name of its first user in ``objects``."""
+
+    meshes = []
+    names = []
+    seen = set()
+    for ob in objects:
+        if ob.type != "MESH" or ob.data.library is not None:
+            continue
+        key = ob.data.as_pointer()
+        if key in seen:
+            continue
+        seen.add(key)
+        meshes.append(ob.data)
+        names.append(ob.name)
+    return meshes, names
+
+
+@profiled("lib.rename_batches")
+def rename_batches(batches):
+    """Rename several (data attribute, ids, names) batches in one pass.
+
+    Batches on the same ``bpy.data`` collection, e.g. "objects", are merged
+    so each collection is indexed once however many batches touch it.
+    Returns a dict of data attribute to the resolved names, in batch order.
+    """
+
+    merged = {}
+    for attr, ids, names in batches:
+        ids_all, names_all = merged.setdefault(attr, ([], []))
+        ids_all += ids
+        names_all += names
+
+    return {
+        attr: rename_ids(ids, names, getattr(bpy.data, attr))
+        for attr, (ids, names) in merged.items()
+    }
+
+
+# Cache
+# -------------------------------------
+
+
+class AnalysisCache:
+    """LRU cache for analysis results and BVH trees, bounded by a byte budget."""
+
+    def __init__(self, budget=256 * 1024 * 1024):
+        from collections import OrderedDict
+
+        self.budget = budget
+        self.size = 0
+        self._items = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        item = self._items.get(key)
+        if item is None:
+            return default
+
+        self._items.move_to_end(key)
+        return item[0]
+
+    def put(self, key, value, size=None):
+        if size is None:
+            size = sizeof_value(value)
+
+        self.discard(key)
+        if size > self.budget:
+            return value
+
+        self._items[key] = (value, size)
+        self.size += size
+        self.trim()
+
+        return value
+
+    def discard(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.size -= item[1]
+
+    def trim(self):
+        while self.size > self.budget and self._items:
+            _key, (_value, size) = self._items.popitem(last=False)
+            self.size -= size
+
+    def clear(self):
+        self._items.clear()
+        self.size = 0
+
+
+analysis_cache = AnalysisCache()
+
+
+def sizeof_value(value) -> int:
+    # Rough byte size of a cached value
+
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if hasattr(value, "buffer_info"):
+        return value.buffer_info()[1] * value.itemsize
+    if isinstance(value, (tuple, list)):
+        return sum(sizeof_value(v) for v in value)
+    if isinstance(value, dict):
+        return sum(sizeof_value(v) for v in value.values())
+
+    import sys
+
+    return sys.getsizeof(value)
+
+
+@profiled("lib.mesh_hash")
+def mesh_hash(me, *params) -> str:
+    """Cheap hash of the vertex and polygon buffers plus ``params``, object mode data."""
+
+    co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+    me.vertices.foreach_get("co", co)
+    loop_vert = np.empty(len(me.loops), dtype=np.int32)
+    me.loops.foreach_get("vertex_index", loop_vert)
+    loop_start = np.empty(len(me.polygons), dtype=np.int32)
+    me.polygons.foreach_get("loop_start", loop_start)
+
+    return arrays_hash(co, loop_vert, loop_start, *params)
+
+
+def arrays_hash(co, loop_vert, loop_start, *params) -> str:
+    """mesh_hash() of buffers that were already read, e.g. from an evaluated mesh."""
+    import hashlib
+
+    co = np.ascontiguousarray(co, dtype=np.float32)
+    loop_vert = np.ascontiguousarray(loop_vert, dtype=np.int32)
+    loop_start = np.ascontiguousarray(loop_start, dtype=np.int32)
+
+    h = hashlib.blake2b(digest_size=16)
+    h.update(co.tobytes())
+    h.update(loop_vert.tobytes())
+    h.update(loop_start.tobytes())
+    h.update(repr(params).encode())
+
+    return h.hexdigest()
+
+
+def matrix_key(matrix) -> tuple:
+    return tuple(tuple(row) for row in matrix)
+
+
 # Mesh
 # -------------------------------------
 
 
+@profiled("lib.bmesh_copy_from_object")
 def bmesh_copy_from_object(obj, transform=True, triangulate=True, apply_modifiers=False):
-    """Returns a transformed, triangulated copy of the mesh"""
+    """Returns a transformed, triangulated copy of the mesh
+
+    The copy carries every custom data layer. Checks that only need
+    positions and topology read mesh_snapshot() instead, which never
+    allocates them.
+    """
 
     assert obj.type == "MESH"
 
@@ -38,6 +613,7 @@ def bmesh_copy_from_object(obj, transform=True, triangulate=True, apply_modifier
         obj_eval = obj.evaluated_get(depsgraph)
         me = obj_eval.to_mesh()
         bm = bmesh.new()
+        profiler.count("bmesh allocations")
         bm.from_mesh(me)
         obj_eval.to_mesh_clear()
     else:
@@ -48,9 +624,7 @@ def bmesh_copy_from_object(obj, transform=True, triangulate=True, apply_modifier
         else:
             bm = bmesh.new()
             bm.from_mesh(me)
-
-    # TODO. remove all customdata layers.
-    # would save ram
+        profiler.count("bmesh allocations")
 
     if transform:
         matrix = obj.matrix_world.copy()
@@ -96,110 +670,308 @@ def bmesh_calc_area(bm):
     return sum(f.calc_area() for f in bm.faces)
 
 
+@profiled("lib.bmesh_check_self_intersect_object")
 def bmesh_check_self_intersect_object(obj):
-    """Check if any faces self intersect returns an array of edge index values."""
+    """Check if any faces self intersect returns an array of face index values."""
     import array
 
-    import mathutils
-
     if not obj.data.polygons:
         return array.array("i", ())
 
-    bm = bmesh_copy_from_object(obj, transform=False, triangulate=False)
-    tree = mathutils.bvhtree.BVHTree.FromBMesh(bm, epsilon=0.00001)
-    overlap = tree.overlap(tree)
-    faces_error = {i for i_pair in overlap for i in i_pair}
+    if obj.mode == "EDIT":
+        obj.update_from_editmode()
+
+    key = mesh_hash(obj.data)
+    faces_error = analysis_cache.get(("self_intersect", key))
+    if faces_error is not None:
+        return faces_error
+
+    profiler.count("faces processed", len(obj.data.polygons))
+
+    tree, face_map = mesh_bvh(obj, key=key)
+    faces_error = self_overlap_faces(tree, face_map)
+
+    return analysis_cache.put(("self_intersect", key), array.array("i", faces_error.tolist()))
+
+
+@profiled("lib.mesh_bvh")
+def mesh_bvh(obj, transform=False, epsilon=0.00001, key=None):
+    """Returns a cached (BVHTree, triangle -> face index array) of the object.
+
+    Built from the loop triangles with BVHTree.FromPolygons, no bmesh copy.
+    ``key`` is the object's mesh_hash() when the caller already has it.
+    """
+    from mathutils.bvhtree import BVHTree
+
+    if key is None:
+        if obj.mode == "EDIT":
+            obj.update_from_editmode()
+        key = mesh_hash(obj.data)
+
+    if transform:
+        cache_key = ("bvh_world", key, epsilon, matrix_key(obj.matrix_world))
+    else:
+        cache_key = ("bvh_local", key, epsilon)
+
+    item = analysis_cache.get(cache_key)
+    if item is None:
+        snapshot = mesh_snapshot(obj, transform=transform)
+        tree = BVHTree.FromPolygons(snapshot["co"].tolist(), snapshot["tris"].tolist(), all_triangles=True, epsilon=epsilon)
+        size = snapshot["face_map"].nbytes + len(snapshot["tris"]) * 128
+        item = analysis_cache.put(cache_key, (tree, snapshot["face_map"]), size=size)
+
+    return item
+
 
-    return array.array("i", faces_error)
+def overlap_faces(pairs, face_map_a, face_map_b, same=False):
+    """Map BVHTree.overlap() triangle pairs to (faces of a, faces of b).
 
+    With ``same`` pairs from two triangles of one face are dropped.
+    """
 
-def bmesh_face_points_random(f, num_points=1, margin=0.05):
-    import random
-    from random import uniform
+    pairs = np.array(pairs, dtype=np.int32).reshape(-1, 2)
+    faces_a = face_map_a[pairs[:, 0]]
+    faces_b = face_map_b[pairs[:, 1]]
 
-    # for pradictable results
-    random.seed(f.index)
+    if same:
+        keep = faces_a != faces_b
+        faces_a = faces_a[keep]
+        faces_b = faces_b[keep]
 
-    uniform_args = 0.0 + margin, 1.0 - margin
-    vecs = [v.co for v in f.verts]
+    return np.unique(faces_a), np.unique(faces_b)
 
-    for _ in range(num_points):
-        u1 = uniform(*uniform_args)
-        u2 = uniform(*uniform_args)
-        u_tot = u1 + u2
 
-        if u_tot > 1.0:
-            u1 = 1.0 - u1
-            u2 = 1.0 - u2
+def self_overlap_faces(tree, face_map):
+    return np.union1d(*overlap_faces(tree.overlap(tree), face_map, face_map, same=True))
 
-        side1 = vecs[1] - vecs[0]
-        side2 = vecs[2] - vecs[0]
 
-        yield vecs[0] + u1 * side1 + u2 * side2
+def pair_overlap_faces(tree_a, face_map_a, tree_b, face_map_b):
+    return overlap_faces(tree_a.overlap(tree_b), face_map_a, face_map_b)
 
 
+def world_bounds(obj):
+    """Axis aligned (min, max) of the object's bounding box in world space."""
+
+    corners = np.array([corner[:] for corner in obj.bound_box], dtype=np.float64)
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    corners = corners @ matrix[:3, :3].T + matrix[:3, 3]
+
+    return corners.min(axis=0), corners.max(axis=0)
+
+
+def aabb_overlap_pairs(bounds):
+    """Sweep and prune over x, returns (i, j) pairs whose (min, max) boxes overlap."""
+
+    if not bounds:
+        return []
+
+    lo = np.array([b[0] for b in bounds])
+    hi = np.array([b[1] for b in bounds])
+    order = np.argsort(lo[:, 0], kind="stable")
+
+    pairs = []
+    active = []
+    for i in order.tolist():
+        active = [j for j in active if hi[j, 0] >= lo[i, 0]]
+        for j in active:
+            if np.all(lo[i] <= hi[j]) and np.all(lo[j] <= hi[i]):
+                pairs.append((min(i, j), max(i, j)))
+        active.append(i)
+
+    return pairs
+
+
+def iter_check_intersect_objects(objects, inter_object=False, workers=None):
+    """Self intersection for many objects, yields (progress, text) steps.
+
+    Trees are built on the main thread and overlapped on a thread pool. With
+    ``inter_object`` object pairs whose world bounds overlap are tested
+    against each other too. Returns {object name: face index array}.
+    """
+    import array
+    from concurrent.futures import ThreadPoolExecutor, wait
+
+    objects = [ob for ob in objects if ob.type == "MESH" and ob.data.polygons]
+    results = {ob.name: np.empty(0, dtype=np.int32) for ob in objects}
+    if not objects:
+        return results
+
+    def add(name, faces):
+        results[name] = np.union1d(results[name], faces)
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        jobs = []
+        for n, ob in enumerate(objects):
+            yield 0.25 * n / len(objects), f"Building {ob.name}"
+            if ob.mode == "EDIT":
+                ob.update_from_editmode()
+            key = mesh_hash(ob.data)
+            cached = analysis_cache.get(("self_intersect", key))
+            if cached is not None:
+                add(ob.name, np.asarray(cached, dtype=np.int32))
+                continue
+
+            profiler.count("faces processed", len(ob.data.polygons))
+            tree, face_map = mesh_bvh(ob, key=key)
+            future = pool.submit(self_overlap_faces, tree, face_map)
+            jobs.append((ob, future, key))
+
+        if inter_object:
+            pairs = aabb_overlap_pairs([world_bounds(ob) for ob in objects])
+            for n, (i, j) in enumerate(pairs):
+                a, b = objects[i], objects[j]
+                yield 0.25 + 0.25 * n / len(pairs), f"Building {a.name} / {b.name}"
+                tree_a, face_map_a = mesh_bvh(a, transform=True)
+                tree_b, face_map_b = mesh_bvh(b, transform=True)
+                future = pool.submit(pair_overlap_faces, tree_a, face_map_a, tree_b, face_map_b)
+                jobs.append(((a, b), future, None))
+
+        for n, (item, future, key) in enumerate(jobs):
+            while not wait([future], timeout=0.01).done:
+                yield 0.5 + 0.5 * n / len(jobs), "Overlapping"
+
+            if key is not None:
+                faces = future.result()
+                analysis_cache.put(("self_intersect", key), array.array("i", faces.tolist()))
+                add(item.name, faces)
+            else:
+                faces_a, faces_b = future.result()
+                add(item[0].name, faces_a)
+                add(item[1].name, faces_b)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+def random_uniform(seeds):
+    # Counter based generator (splitmix64), the same seed always gives the
+    # same value without touching global RNG state: uint64 -> [0, 1)
+
+    z = seeds.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+
+    return (z >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+def face_points_random(tri_co, face_index=None, num_points=1, margin=0.05):
+    """Random points on triangles, returns a (len(tri_co) * num_points, 3) array.
+
+    ``tri_co`` is a (N, 3, 3) array of triangle corners, samples are seeded
+    per face from ``face_index`` (defaults to the row number) for predictable
+    results.
+    """
+
+    tri_co = np.asarray(tri_co, dtype=np.float64).reshape(-1, 3, 3)
+    if face_index is None:
+        face_index = np.arange(len(tri_co))
+
+    counter = np.asarray(face_index, dtype=np.uint64)[:, None] * np.uint64(2 * num_points)
+    counter = counter + np.arange(2 * num_points, dtype=np.uint64)
+    u = random_uniform(counter.ravel()).reshape(-1, 2)
+    u = margin + u * (1.0 - 2.0 * margin)
+
+    flip = u.sum(axis=1) > 1.0
+    u[flip] = 1.0 - u[flip]
+
+    v0 = np.repeat(tri_co[:, 0], num_points, axis=0)
+    side1 = np.repeat(tri_co[:, 1] - tri_co[:, 0], num_points, axis=0)
+    side2 = np.repeat(tri_co[:, 2] - tri_co[:, 0], num_points, axis=0)
+
+    return v0 + u[:, :1] * side1 + u[:, 1:] * side2
+
+
+@profiled("lib.bmesh_check_thick_object")
 def bmesh_check_thick_object(obj, thickness):
+    return run_steps(iter_check_thick_object(obj, thickness))
+
+
+def iter_check_thick_object(obj, thickness, chunk_size=4096):
+    """Step version of bmesh_check_thick_object(), see run_steps()."""
+
+    if obj.mode == "EDIT":
+        obj.update_from_editmode()
+
+    key = ("thick", mesh_hash(obj.data, thickness, matrix_key(obj.matrix_world)))
+    faces_error = analysis_cache.get(key)
+    if faces_error is None:
+        faces_error = yield from _iter_check_thick_object(obj, thickness, chunk_size)
+        analysis_cache.put(key, faces_error)
+
+    return faces_error
+
+
+def _iter_check_thick_object(obj, thickness, chunk_size):
     import array
 
-    # Triangulate
-    bm = bmesh_copy_from_object(obj, transform=True, triangulate=False)
+    from mathutils.bvhtree import BVHTree
 
-    # map original faces to their index.
-    face_index_map_org = {f: i for i, f in enumerate(bm.faces)}
-    ret = bmesh.ops.triangulate(bm, faces=bm.faces)
-    face_map = ret["face_map"]
-    del ret
-    # old edge -> new mapping
+    # Triangles straight from the mesh, no bmesh copy
+    snapshot = mesh_snapshot(obj, transform=True)
+    co = snapshot["co"]
+    tris = snapshot["tris"]
 
-    # Convert new/old map to index dict.
+    # Ray-cast against a tree of the triangles, no temporary mesh or object
+    # and no view layer updates.
+    tree = BVHTree.FromPolygons(co.tolist(), tris.tolist(), all_triangles=True)
+    profiler.count("faces processed", snapshot["face_count"])
 
-    # Create a real mesh (lame!)
-    context = bpy.context
-    layer = context.view_layer
-    scene_collection = context.layer_collection.collection
+    faces_error = yield from iter_thick_faces(co, tris, snapshot["face_map"], tree, thickness, chunk_size, f"Thickness {obj.name}")
 
-    me_tmp = bpy.data.meshes.new(name="~temp~")
-    bm.to_mesh(me_tmp)
-    obj_tmp = bpy.data.objects.new(name=me_tmp.name, object_data=me_tmp)
-    scene_collection.objects.link(obj_tmp)
+    return array.array("i", faces_error.tolist())
 
-    layer.update()
-    ray_cast = obj_tmp.ray_cast
 
-    EPS_BIAS = 0.0001
+def iter_thick_faces(co, tris, face_map, tree, thickness, chunk_size=4096, text="Thickness", sources=None, tri_ids=None):
+    """Faces closer than ``thickness`` to the opposite side, yields (progress, text) steps.
 
-    faces_error = set()
-    bm_faces_new = bm.faces[:]
+    ``tree`` is a BVHTree of the world space triangles ``co[tris]``,
+    ``face_map`` maps triangles to faces. Rays are cast from the
+    ``sources`` triangle indices, all by default. Samples are seeded by
+    ``tri_ids``, the mesh-wide index of each triangle (default the row), so
+    a subset of the mesh gets the same rays as the whole. Returns a sorted
+    face index array.
+    """
 
-    for f in bm_faces_new:
-        no = f.normal
-        no_sta = no * EPS_BIAS
-        no_end = no * thickness
-        for p in bmesh_face_points_random(f, num_points=6):
-            # Cast the ray backwards
-            p_a = p - no_sta
-            p_b = p - no_end
-            p_dir = p_b - p_a
+    num_points = 6
+    rows = np.arange(len(tris)) if sources is None else sources
+    tri_co = co[tris[rows]].astype(np.float64)
+    points = face_points_random(tri_co, rows if tri_ids is None else tri_ids[rows], num_points)
+    normals = np.repeat(triangle_normals(tri_co), num_points, axis=0)
+    del tri_co
 
-            ok, _co, no, index = ray_cast(p_a, p_dir, distance=p_dir.length)
+    EPS_BIAS = 0.0001
 
-            if ok:
-                # Add the face we hit
-                for f_iter in (f, bm_faces_new[index]):
-                    # if the face wasn't triangulated, just use existing
-                    f_org = face_map.get(f_iter, f_iter)
-                    f_org_index = face_index_map_org[f_org]
-                    faces_error.add(f_org_index)
+    # Cast the rays backwards
+    p_a = points - normals * EPS_BIAS
+    p_b = points - normals * thickness
+    p_dir = p_b - p_a
+    p_len = np.linalg.norm(p_dir, axis=1)
 
-    bm.free()
+    ray_cast = tree.ray_cast
+    rays = np.flatnonzero(p_len > 0.0)
+    hit_src = []
+    hit_dst = []
+
+    for start in range(0, len(rays), chunk_size):
+        yield start / len(rays), text
+
+        chunk = rays[start:start + chunk_size]
+        for i, origin, direction, length in zip(chunk.tolist(), p_a[chunk].tolist(), p_dir[chunk].tolist(), p_len[chunk].tolist()):
+            _co, _no, index, _dist = ray_cast(origin, direction, length)
 
-    scene_collection.objects.unlink(obj_tmp)
-    bpy.data.objects.remove(obj_tmp)
-    bpy.data.meshes.remove(me_tmp)
+            if index is not None:
+                # Add the face we hit
+                hit_src.append(i // num_points)
+                hit_dst.append(index)
 
-    layer.update()
+    hit_src = np.array(hit_src, dtype=np.int64)
+    if sources is not None:
+        hit_src = sources[hit_src]
 
-    return array.array("i", faces_error)
+    return np.union1d(face_map[hit_src], face_map[hit_dst])
 
 
 def face_is_distorted(ele, angle_distort):
@@ -216,3 +988,1201 @@ def face_is_distorted(ele, angle_distort):
             return True
 
     return False
+
+
+# Arrays
+# -------------------------------------
+
+
+@profiled("lib.mesh_loop_arrays")
+def mesh_loop_arrays(me):
+    """Read vertex, loop and polygon buffers for per-corner checks, object mode only."""
+
+    polys = me.polygons
+
+    co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+    me.vertices.foreach_get("co", co)
+    loop_vert = np.empty(len(me.loops), dtype=np.int32)
+    me.loops.foreach_get("vertex_index", loop_vert)
+
+    loop_start = np.empty(len(polys), dtype=np.int32)
+    loop_total = np.empty(len(polys), dtype=np.int32)
+    poly_normal = np.empty(len(polys) * 3, dtype=np.float32)
+    polys.foreach_get("loop_start", loop_start)
+    polys.foreach_get("loop_total", loop_total)
+    polys.foreach_get("normal", poly_normal)
+
+    return {
+        "co": co.reshape(-1, 3),
+        "loop_vert": loop_vert,
+        "loop_start": loop_start,
+        "loop_total": loop_total,
+        "poly_normal": poly_normal.reshape(-1, 3),
+    }
+
+
+@profiled("lib.mesh_concave_arrays")
+def mesh_concave_arrays(me, centers=True):
+    """Read the buffers concave_face_mask() needs, object mode only.
+
+    With ``centers=False`` triangle centers and normals are not read, they
+    are computed for the classified faces only.
+    """
+
+    me.calc_loop_triangles()
+    tris = me.loop_triangles
+
+    tri_vert = np.empty(len(tris) * 3, dtype=np.int32)
+    tri_poly = np.empty(len(tris), dtype=np.int32)
+    tris.foreach_get("vertices", tri_vert)
+    tris.foreach_get("polygon_index", tri_poly)
+
+    arrays = mesh_loop_arrays(me)
+
+    # Triangles of a polygon are stored next to each other
+    tri_count = np.bincount(tri_poly, minlength=len(arrays["loop_start"]))
+    tri_first = np.cumsum(tri_count) - tri_count
+
+    if centers:
+        tri_center = np.empty(len(tris) * 3, dtype=np.float32)
+        tri_normal = np.empty(len(tris) * 3, dtype=np.float32)
+        tris.foreach_get("center", tri_center)
+        tris.foreach_get("normal", tri_normal)
+        arrays["tri_center"] = tri_center.reshape(-1, 3)
+        arrays["tri_normal"] = tri_normal.reshape(-1, 3)
+
+    arrays.update({
+        "tri_vert": tri_vert.reshape(-1, 3),
+        "tri_poly": tri_poly,
+        "tri_count": tri_count,
+        "tri_first": tri_first,
+    })
+
+    return arrays
+
+
+def concave_arrays_update(arrays, me):
+    """Refresh ``arrays`` from an edited ``me`` in place.
+
+    Returns the indices of the faces whose vertices moved, only their
+    triangle centers and normals are recalculated. Returns None when the topology changed and
+    the arrays have to be read again. Object mode data.
+    """
+
+    if len(me.vertices) != len(arrays["co"]) or len(me.loops) != len(arrays["loop_vert"]) or len(me.polygons) != len(arrays["loop_start"]):
+        return None
+
+    loop_vert = np.empty(len(me.loops), dtype=np.int32)
+    me.loops.foreach_get("vertex_index", loop_vert)
+    if not np.array_equal(loop_vert, arrays["loop_vert"]):
+        return None
+
+    co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+    me.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)
+
+    moved = np.any(co != arrays["co"], axis=1)
+    if not moved.any():
+        return np.empty(0, dtype=np.int64)
+
+    faces = np.flatnonzero(np.logical_or.reduceat(moved[loop_vert], arrays["loop_start"]))
+
+    arrays["co"] = co
+    me.polygons.foreach_get("normal", arrays["poly_normal"].ravel())
+
+    # Blender picks a quad's split diagonal from its vertex positions, so the
+    # triangle corners are read again, the count per face can not change.
+    me.calc_loop_triangles()
+    me.loop_triangles.foreach_get("vertices", arrays["tri_vert"].ravel())
+
+    # Triangles of the moved faces, the rest keep their cached values
+    tris = face_triangles(arrays, faces)
+    tri_co = co[arrays["tri_vert"][tris]]
+    arrays["tri_center"][tris] = tri_co.mean(axis=1)
+    arrays["tri_normal"][tris] = triangle_normals(tri_co)
+
+    return faces
+
+
+def face_triangles(arrays, faces):
+    """Indices of the loop triangles of ``faces``, see mesh_concave_arrays()."""
+
+    tri_count = arrays["tri_count"][faces]
+    first = np.cumsum(tri_count) - tri_count
+
+    return np.repeat(arrays["tri_first"][faces] - first, tri_count) + np.arange(tri_count.sum())
+
+
+def loop_neighbors(loop_start, loop_total):
+    """Returns (poly, loop, prev, next) index arrays for every loop of the given faces.
+
+    ``poly`` indexes into ``loop_start``, the others are mesh loop indices.
+    """
+
+    poly = np.repeat(np.arange(len(loop_start)), loop_total)
+    start = loop_start[poly]
+    total = loop_total[poly]
+    first = np.cumsum(loop_total) - loop_total
+    offset = np.arange(len(poly)) - first[poly]
+
+    loop = start + offset
+    l_prev = start + (offset - 1) % total
+    l_next = start + (offset + 1) % total
+
+    return poly, loop, l_prev, l_next
+
+
+def concave_face_mask(arrays, tolerance=0.0, faces=None):
+    """Boolean face mask of concave quads and faces with a non-convex corner.
+
+    With ``faces`` (an index array) only those faces are classified and the
+    mask matches ``faces``.
+    """
+
+    if faces is None:
+        faces = np.arange(len(arrays["loop_start"]))
+    loop_start = arrays["loop_start"][faces]
+    loop_total = arrays["loop_total"][faces]
+    mask = np.zeros(len(faces), dtype=bool)
+
+    # Quads: the two triangle normals lean towards each other when concave.
+    quads = np.flatnonzero(arrays["tri_count"][faces] == 2)
+    if len(quads):
+        t1 = arrays["tri_first"][faces[quads]]
+        t2 = t1 + 1
+        if "tri_center" in arrays:
+            c1, n1 = arrays["tri_center"][t1], arrays["tri_normal"][t1]
+            c2, n2 = arrays["tri_center"][t2], arrays["tri_normal"][t2]
+        else:
+            tri_co = arrays["co"][arrays["tri_vert"][t1]]
+            c1, n1 = tri_co.mean(axis=1), triangle_normals(tri_co)
+            tri_co = arrays["co"][arrays["tri_vert"][t2]]
+            c2, n2 = tri_co.mean(axis=1), triangle_normals(tri_co)
+        dist = np.linalg.norm(c1 - c2, axis=1)
+
+        # Making sure to not overshoot
+        ray_len = (dist / 2.0)[:, None]
+        test1 = c1 + n1 * ray_len
+        test2 = c2 + n2 * ray_len
+        test_dist = np.linalg.norm(test1 - test2, axis=1)
+
+        # Tolerance is relative to the quad size
+        mask[quads] = test_dist < dist - tolerance * dist
+
+    # Any face: a corner whose normal points away from the face normal, like
+    # BMLoop.is_convex, except that degenerate (straight or zero length)
+    # corners are not flagged where Blender calls them not convex.
+    if len(faces):
+        poly, loop, l_prev, l_next = loop_neighbors(loop_start, loop_total)
+        co = arrays["co"]
+        loop_vert = arrays["loop_vert"]
+        cur = co[loop_vert[loop]]
+        e_next = co[loop_vert[l_next]] - cur
+        e_prev = co[loop_vert[l_prev]] - cur
+        corner = np.cross(e_next, e_prev)
+
+        dot = np.einsum("ij,ij->i", corner, arrays["poly_normal"][faces][poly])
+        # Relative to the edge lengths, |corner|² / (|e_next|² |e_prev|²) is
+        # sin² of the corner angle, so the test does not depend on scale.
+        edge_sq = np.einsum("ij,ij->i", e_next, e_next) * np.einsum("ij,ij->i", e_prev, e_prev)
+        degenerate = np.einsum("ij,ij->i", corner, corner) <= edge_sq * 1e-10
+        concave = (dot < 0.0) & ~degenerate
+        mask |= np.logical_or.reduceat(concave, np.cumsum(loop_total) - loop_total)
+
+    return mask
+
+
+def corner_normals(arrays, faces):
+    """Unit corner normals of every loop of ``faces``, zero for degenerate corners.
+
+    Returns (poly, normals), ``poly`` indexes into ``faces``.
+    """
+
+    poly, loop, l_prev, l_next = loop_neighbors(arrays["loop_start"][faces], arrays["loop_total"][faces])
+    co = arrays["co"]
+    loop_vert = arrays["loop_vert"]
+    cur = co[loop_vert[loop]]
+    corner = np.cross(co[loop_vert[l_next]] - cur, co[loop_vert[l_prev]] - cur)
+
+    length = np.linalg.norm(corner, axis=1, keepdims=True)
+    np.divide(corner, length, out=corner, where=length > 1e-12)
+    corner[length[:, 0] <= 1e-12] = 0.0
+
+    return poly, corner
+
+
+def distorted_face_mask(arrays, angle_distort, faces=None):
+    """Boolean face mask of non-planar faces, mesh-wide face_is_distorted().
+
+    A face is distorted when any corner normal is more than ``angle_distort``
+    (radians) away from the face normal. Triangles are always flat.
+    """
+    import math
+
+    if faces is None:
+        faces = np.arange(len(arrays["loop_start"]))
+    mask = np.zeros(len(faces), dtype=bool)
+
+    ngons = np.flatnonzero(arrays["loop_total"][faces] > 3)
+    if not len(ngons):
+        return mask
+
+    poly, corner = corner_normals(arrays, faces[ngons])
+    # Corners pointing the other way are negated, only the angle matters
+    cos = np.abs(np.einsum("ij,ij->i", corner, arrays["poly_normal"][faces[ngons]][poly]))
+    degenerate = ~corner.any(axis=1)
+    bent = (cos < math.cos(angle_distort)) & ~degenerate
+
+    total = arrays["loop_total"][faces[ngons]]
+    mask[ngons] = np.logical_or.reduceat(bent, np.cumsum(total) - total)
+
+    return mask
+
+
+@profiled("lib.mesh_check_distorted_object")
+def mesh_check_distorted_object(obj, angle_distort):
+    """Returns an array of distorted face index values, see distorted_face_mask()."""
+    import array
+
+    if obj.mode == "EDIT":
+        obj.update_from_editmode()
+
+    key = ("distorted", mesh_hash(obj.data, angle_distort))
+    faces_error = analysis_cache.get(key)
+    if faces_error is None:
+        profiler.count("faces processed", len(obj.data.polygons))
+        mask = distorted_face_mask(mesh_loop_arrays(obj.data), angle_distort)
+        faces_error = analysis_cache.put(key, array.array("i", np.flatnonzero(mask).tolist()))
+
+    return faces_error
+
+
+def iter_concave_masks(meshes, tolerance=0.0, workers=None):
+    """Concave face masks for many meshes, yields (progress, text) steps.
+
+    Unchanged meshes reuse their cached mask, or the result stored on the
+    mesh by mesh_store_result() when the cache does not have it, e.g. after
+    reopening the file. Buffers are read on the main thread between steps
+    and classified on a thread pool, the array passes release the GIL so
+    this scales with cores. Returns the masks.
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait
+
+    geometry = [mesh_hash(me) for me in meshes]
+    keys = [("concave", g, tolerance) for g in geometry]
+    masks = [analysis_cache.get(key) for key in keys]
+    for i, mask in enumerate(masks):
+        if mask is None:
+            stored = mesh_load_result(meshes[i], "CONCAVE", (tolerance,), geometry[i])
+            if stored is not None:
+                masks[i] = analysis_cache.put(keys[i], stored)
+    todo = [i for i, mask in enumerate(masks) if mask is None]
+    if not todo:
+        return masks
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = []
+        for n, i in enumerate(todo):
+            yield 0.5 * n / len(todo), f"Reading {meshes[i].name}"
+            arrays = mesh_concave_arrays(meshes[i])
+            profiler.count("faces processed", len(arrays["loop_start"]))
+            futures.append(pool.submit(concave_face_mask, arrays, tolerance))
+            del arrays
+
+        for n, (i, future) in enumerate(zip(todo, futures)):
+            while not wait([future], timeout=0.01).done:
+                yield 0.5 + 0.5 * n / len(todo), f"Classifying {meshes[i].name}"
+            masks[i] = analysis_cache.put(keys[i], future.result())
+    finally:
+        # Cancelled runs drop whatever is still queued
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return masks
+
+
+@profiled("lib.mesh_flip_faces_inside")
+def mesh_flip_faces_inside(me, face_indices):
+    """Make the normals of a face subset consistent and point them inside.
+
+    Same result as ``mesh.normals_make_consistent(inside=True)`` on a face
+    selection, without edit mode or an operator call, object mode only.
+    """
+
+    if not len(face_indices):
+        return
+
+    bm = bmesh.new()
+    profiler.count("bmesh allocations")
+    bm.from_mesh(me)
+    bm.faces.ensure_lookup_table()
+    faces = [bm.faces[i] for i in face_indices.tolist()]
+
+    bmesh.ops.recalc_face_normals(bm, faces=faces)
+    bmesh.ops.reverse_faces(bm, faces=faces)
+
+    bm.to_mesh(me)
+    bm.free()
+
+
+@profiled("lib.mesh_select_faces")
+def mesh_select_faces(me, mask):
+    """Select only the masked faces and their edges and verts, object mode only."""
+
+    loop_total = np.empty(len(me.polygons), dtype=np.int32)
+    me.polygons.foreach_get("loop_total", loop_total)
+    loop_vert = np.empty(len(me.loops), dtype=np.int32)
+    loop_edge = np.empty(len(me.loops), dtype=np.int32)
+    me.loops.foreach_get("vertex_index", loop_vert)
+    me.loops.foreach_get("edge_index", loop_edge)
+
+    loop_mask = np.repeat(mask, loop_total)
+    vert_select = np.zeros(len(me.vertices), dtype=bool)
+    edge_select = np.zeros(len(me.edges), dtype=bool)
+    vert_select[loop_vert[loop_mask]] = True
+    edge_select[loop_edge[loop_mask]] = True
+
+    me.vertices.foreach_set("select", vert_select)
+    me.edges.foreach_set("select", edge_select)
+    me.polygons.foreach_set("select", mask)
+    me.update()
+
+
+def triangle_normals(tri_co):
+    """Unit normals of a (N, 3, 3) triangle array, degenerate triangles get zero."""
+
+    no = np.cross(tri_co[:, 1] - tri_co[:, 0], tri_co[:, 2] - tri_co[:, 0])
+    length = np.linalg.norm(no, axis=1, keepdims=True)
+    np.divide(no, length, out=no, where=length > 0.0)
+
+    return no
+
+
+@profiled("lib.mesh_snapshot")
+def mesh_snapshot(obj, transform=True, apply_modifiers=False, depsgraph=None):
+    """Compact read-only arrays of the mesh, no bmesh involved.
+
+    Returns a dict with ``co`` (V, 3) vertex positions, ``tris`` (T, 3)
+    triangle vertex indices, ``face_map`` (T,) triangle -> polygon index
+    and ``face_count``. For many modifier applied objects use
+    iter_evaluated_mesh_arrays() instead.
+    """
+
+    assert obj.type == "MESH"
+
+    if apply_modifiers and obj.modifiers:
+        if depsgraph is None:
+            depsgraph = bpy.context.evaluated_depsgraph_get()
+        obj_eval = obj.evaluated_get(depsgraph)
+        me = obj_eval.to_mesh()
+        try:
+            snapshot = snapshot_from_mesh(me)
+        finally:
+            obj_eval.to_mesh_clear()
+    else:
+        if obj.mode == "EDIT":
+            obj.update_from_editmode()
+        snapshot = snapshot_from_mesh(obj.data)
+
+    co = snapshot["co"]
+    if transform:
+        matrix = np.array(obj.matrix_world, dtype=np.float32)
+        if not np.array_equal(matrix, np.identity(4, dtype=np.float32)):
+            snapshot["co"] = co @ matrix[:3, :3].T + matrix[:3, 3]
+
+    for value in snapshot.values():
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+
+    return snapshot
+
+
+def snapshot_from_mesh(me):
+    # The mesh_snapshot() buffers of any mesh, in local space
+
+    me.calc_loop_triangles()
+
+    co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+    me.vertices.foreach_get("co", co)
+    tris = np.empty(len(me.loop_triangles) * 3, dtype=np.int32)
+    me.loop_triangles.foreach_get("vertices", tris)
+    face_map = np.empty(len(me.loop_triangles), dtype=np.int32)
+    me.loop_triangles.foreach_get("polygon_index", face_map)
+
+    return {
+        "co": co.reshape(-1, 3),
+        "tris": tris.reshape(-1, 3),
+        "face_map": face_map,
+        "face_count": len(me.polygons),
+    }
+
+
+def iter_evaluated_mesh_arrays(objects, read=None, depsgraph=None):
+    """Read arrays of the modifier applied meshes of many objects, one at a time.
+
+    The evaluated depsgraph is fetched once and ``object_instances`` is
+    walked to the end before anything is read, instance items are only valid
+    while iterating and the caller may pause between objects. Yields (object,
+    arrays) in depsgraph order, each object's evaluated mesh is fetched with
+    evaluated_get() when its turn comes, read through ``read`` (default
+    mesh_concave_arrays()) and freed straight after with to_mesh_clear().
+    Nothing is kept between yields, the caller drops the arrays once it is
+    done with them so only one object's arrays exist at a time. Objects
+    without modifiers are read from their own data and come first.
+    """
+
+    if read is None:
+        read = mesh_concave_arrays
+
+    objects = [ob for ob in objects if ob.type == "MESH"]
+    wanted = {}
+    for ob in objects:
+        if ob.modifiers:
+            wanted[ob.name] = ob
+        else:
+            if ob.mode == "EDIT":
+                ob.update_from_editmode()
+            yield ob, read(ob.data)
+
+    if not wanted:
+        return
+
+    if depsgraph is None:
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+
+    order = []
+    for instance in depsgraph.object_instances:
+        # Instances from particles or collections are not the objects themselves
+        if instance.is_instance:
+            continue
+        ob = wanted.pop(instance.object.original.name, None)
+        if ob is not None:
+            order.append(ob)
+            if not wanted:
+                break
+    # Hidden objects are not in the view layer's instances
+    order.extend(wanted.values())
+
+    for ob in order:
+        profiler.count("evaluated meshes")
+        obj_eval = ob.evaluated_get(depsgraph)
+        me = obj_eval.to_mesh()
+        try:
+            arrays = read(me)
+        finally:
+            obj_eval.to_mesh_clear()
+        yield ob, arrays
+
+
+def toggle_crease_values(crease, select, floor, maximum, tolerance):
+    """Returns (edge indices, new values) of the selected edges whose crease toggles."""
+
+    low = select & (crease < floor + tolerance)
+    high = select & ~low & (crease > maximum - tolerance)
+    index = np.flatnonzero(low | high)
+    values = np.where(low[index], maximum, floor)
+
+    return index, values
+
+
+@profiled("lib.edit_mesh_toggle_creases")
+def edit_mesh_toggle_creases(obj, floor, maximum, tolerance):
+    """Toggle crease of the selected edges of an edit mode object.
+
+    Selection and crease are read as arrays, only edges that change are
+    written back through bmesh. Returns the number of edges changed.
+    """
+
+    me = obj.data
+    if not me.total_edge_sel:
+        return 0
+
+    bm = bmesh.from_edit_mesh(me)
+
+    if bpy.app.version[0] == 3:
+        crease_layer = bm.edges.layers.crease.verify()
+        prop = "crease"
+    else:
+        crease_layer = bm.edges.layers.float.get("crease_edge")
+        if crease_layer is None:
+            crease_layer = bm.edges.layers.float.new("crease_edge")
+        prop = "crease_edge"
+
+    # Sync the edit mesh so the buffers can be read in bulk
+    obj.update_from_editmode()
+
+    select = np.empty(len(me.edges), dtype=bool)
+    me.edges.foreach_get("select", select)
+    if not select.any():
+        return 0
+
+    crease = np.zeros(len(me.edges), dtype=np.float32)
+    if prop == "crease":
+        me.edges.foreach_get("crease", crease)
+    else:
+        me.attributes[prop].data.foreach_get("value", crease)
+
+    profiler.count("edges processed", len(select))
+    index, values = toggle_crease_values(crease, select, floor, maximum, tolerance)
+    if not len(index):
+        return 0
+
+    bm.edges.ensure_lookup_table()
+    edges = bm.edges
+    for i, value in zip(index.tolist(), values.tolist()):
+        edges[i][crease_layer] = value
+
+    bmesh.update_edit_mesh(me)
+
+    return len(index)
+
+
+# Health
+# -------------------------------------
+
+
+# Checks a health report can run, in the order they are run.
+HEALTH_CHECKS = ("CONCAVE", "DISTORTED", "SELF_INTERSECT", "THICKNESS")
+
+
+def iter_mesh_health(obj, checks, tolerance=0.0, angle_distort=0.0872665, thickness=0.01, chunk_size=4096, budget=0, arrays=None):
+    """Run the enabled ``checks`` on one read of the mesh, yields (progress, text) steps.
+
+    The geometry is hashed once for the cache and the stored results, then
+    the buffers are read once for all checks, and thickness and self
+    intersection share a single world space tree. Meshes whose working set
+    would exceed ``budget`` bytes (0 for no limit) are checked tile by tile,
+    see iter_tiled_masks(). ``arrays`` are mesh_concave_arrays() already
+    read, e.g. by iter_evaluated_mesh_arrays(), and are used instead of the
+    object's own mesh. Returns (row, masks): ``row`` holds the face and
+    triangle counts, world area, the flagged face count per check and the
+    milliseconds spent per stage, ``masks`` a boolean face mask per check.
+    """
+
+    if obj.mode == "EDIT":
+        obj.update_from_editmode()
+
+    checks = [check for check in HEALTH_CHECKS if check in checks]
+    me = obj.data
+    params = (tuple(checks), tolerance, angle_distort, thickness, matrix_key(obj.matrix_world))
+
+    # The geometry is hashed once, for the cache and the stored results
+    if arrays is None:
+        geometry = mesh_hash(me)
+        key = ("health", geometry, params)
+    else:
+        geometry = arrays_hash(arrays["co"], arrays["loop_vert"], arrays["loop_start"])
+        key = ("health_evaluated", geometry, params)
+    result = analysis_cache.get(key)
+    if result is not None:
+        row, masks = result
+        return dict(row, object=obj.name), masks
+
+    stored = {}
+    if arrays is None:
+        profiler.count("faces processed", len(me.polygons))
+        tri_count = estimate_tri_count(me)
+
+        # Results stored with the mesh are reused while geometry and settings match
+        for check in checks:
+            mask = mesh_load_result(me, check, health_params(obj, check, tolerance, angle_distort, thickness), geometry)
+            if mask is not None:
+                stored[check] = mask
+    else:
+        profiler.count("faces processed", len(arrays["loop_start"]))
+        tri_count = len(arrays["tri_vert"])
+    todo = [check for check in checks if check not in stored]
+
+    if budget and tri_count * TILE_BYTES_PER_TRI > budget:
+        steps = iter_tiled_masks(obj, todo, tolerance, angle_distort, thickness, budget, chunk_size, arrays)
+    else:
+        steps = _iter_health_masks(obj, todo, tolerance, angle_distort, thickness, chunk_size, arrays)
+    masks, timings, face_count, tri_count, area = yield from steps
+    masks.update(stored)
+
+    row = {
+        "object": obj.name,
+        "faces": face_count,
+        "tris": tri_count,
+        "area": float(area),
+    }
+    for check in HEALTH_CHECKS:
+        row[check.lower()] = int(np.count_nonzero(masks[check])) if check in masks else None
+    for name, seconds in timings.items():
+        row[f"{name}_ms"] = round(seconds * 1000.0, 3)
+    row["total_ms"] = round(sum(timings.values()) * 1000.0, 3)
+
+    return analysis_cache.put(key, (row, masks))
+
+
+def _iter_health_masks(obj, checks, tolerance, angle_distort, thickness, chunk_size, arrays=None):
+    import time
+
+    from mathutils.bvhtree import BVHTree
+
+    timings = {}
+    start = time.perf_counter()
+
+    if arrays is None:
+        arrays = mesh_concave_arrays(obj.data)
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    co = arrays["co"] @ matrix[:3, :3].T + matrix[:3, 3]
+    tris = arrays["tri_vert"]
+    face_map = arrays["tri_poly"]
+    face_count = len(arrays["loop_start"])
+
+    tri_co = co[tris]
+    area = 0.5 * np.linalg.norm(np.cross(tri_co[:, 1] - tri_co[:, 0], tri_co[:, 2] - tri_co[:, 0]), axis=1).sum()
+    del tri_co
+
+    tree = None
+    if "SELF_INTERSECT" in checks or "THICKNESS" in checks:
+        tree = BVHTree.FromPolygons(co.tolist(), tris.tolist(), all_triangles=True, epsilon=0.00001)
+
+    timings["read"] = time.perf_counter() - start
+
+    masks = {}
+    for n, check in enumerate(checks):
+        yield n / len(checks), f"{check.replace('_', ' ').title()} {obj.name}"
+        start = time.perf_counter()
+
+        if check == "CONCAVE":
+            mask = concave_face_mask(arrays, tolerance)
+        elif check == "DISTORTED":
+            mask = distorted_face_mask(arrays, angle_distort)
+        else:
+            if check == "SELF_INTERSECT":
+                faces = self_overlap_faces(tree, face_map)
+            else:
+                steps = iter_thick_faces(co, tris, face_map, tree, thickness, chunk_size, f"Thickness {obj.name}")
+                faces = yield from iter_scaled(steps, n / len(checks), (n + 1) / len(checks))
+            mask = np.zeros(face_count, dtype=bool)
+            mask[faces] = True
+
+        masks[check] = mask
+        timings[check.lower()] = time.perf_counter() - start
+
+    return masks, timings, face_count, len(tris), area
+
+
+def health_params(obj, check, tolerance=0.0, angle_distort=0.0872665, thickness=0.01):
+    # The settings a check result depends on besides the geometry
+
+    if check == "CONCAVE":
+        return (tolerance,)
+    if check == "DISTORTED":
+        return (angle_distort,)
+    if check == "THICKNESS":
+        return (thickness, matrix_key(obj.matrix_world))
+    return ()
+
+
+def write_table(rows, filepath):
+    """Write a list of row dicts as CSV, or as JSON when ``filepath`` ends in .json."""
+
+    if filepath.lower().endswith(".json"):
+        import json
+
+        with open(filepath, "w") as f:
+            json.dump(rows, f, indent=2)
+        return
+
+    import csv
+
+    fields = list({name: None for row in rows for name in row})
+    with open(filepath, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# Results
+# -------------------------------------
+
+
+# Face attributes and the mesh custom property holding stored check results.
+RESULT_PREFIX = "sierra_"
+RESULT_STAMP = "sierra_results"
+
+
+def result_attribute_name(check, previous=False):
+    return RESULT_PREFIX + check.lower() + ("_prev" if previous else "")
+
+
+def _read_face_bools(attribute, count):
+    values = np.zeros(count, dtype=bool)
+    attribute.data.foreach_get("value", values)
+    return values
+
+
+@profiled("lib.mesh_store_result")
+def mesh_store_result(me, check, mask, params, geometry=None):
+    """Store a check's face mask as a boolean face attribute, object mode only.
+
+    The mask it replaces is kept as the ``_prev`` attribute for
+    mesh_result_diff(), and the geometry hash and ``params`` are stamped on
+    the mesh so mesh_load_result() can tell whether the result still holds.
+    """
+
+    name = result_attribute_name(check)
+    prev_name = result_attribute_name(check, previous=True)
+    attributes = me.attributes
+    count = len(me.polygons)
+
+    stamp = {
+        "hash": mesh_hash(me) if geometry is None else geometry,
+        "params": repr(params),
+    }
+    old_stamp = me.get(RESULT_STAMP, {}).get(check)
+    if name in attributes and old_stamp is not None and all(old_stamp.get(k) == v for k, v in stamp.items()):
+        # Same geometry and settings, keep the previous run for diffing
+        return
+
+    if name in attributes:
+        old = _read_face_bools(attributes[name], count)
+        if prev_name not in attributes:
+            attributes.new(prev_name, "BOOLEAN", "FACE")
+        attributes[prev_name].data.foreach_set("value", old)
+    else:
+        attributes.new(name, "BOOLEAN", "FACE")
+
+    # Look up again, adding attributes invalidates earlier references
+    attributes[name].data.foreach_set("value", np.asarray(mask, dtype=bool))
+
+    if RESULT_STAMP not in me:
+        me[RESULT_STAMP] = {}
+    me[RESULT_STAMP][check] = stamp
+
+
+def mesh_load_result(me, check, params, geometry=None):
+    """Returns the stored face mask of ``check``, or None if missing or stale."""
+
+    stamp = me.get(RESULT_STAMP, {}).get(check)
+    attribute = me.attributes.get(result_attribute_name(check))
+    if stamp is None or attribute is None:
+        return None
+
+    if stamp["params"] != repr(params):
+        return None
+    if stamp["hash"] != (mesh_hash(me) if geometry is None else geometry):
+        return None
+
+    profiler.count("stored results reused")
+    return _read_face_bools(attribute, len(me.polygons))
+
+
+def mesh_result_diff(me, check):
+    """Face mask of faces whose ``check`` status changed since the previous run, or None."""
+
+    attributes = me.attributes
+    current = attributes.get(result_attribute_name(check))
+    previous = attributes.get(result_attribute_name(check, previous=True))
+    if current is None or previous is None:
+        return None
+
+    count = len(me.polygons)
+    return _read_face_bools(current, count) ^ _read_face_bools(previous, count)
+
+
+# Tiles
+# -------------------------------------
+
+
+# Rough working set per triangle of a tile: tree nodes, ray samples and
+# float64 temporaries.
+TILE_BYTES_PER_TRI = 1024
+
+
+def estimate_tri_count(me):
+    # Loop triangles without triangulating, an n-gon has n - 2
+    return max(len(me.loops) - 2 * len(me.polygons), 0)
+
+
+def spatial_tiles(centers, max_count):
+    """Split points into tiles of at most ``max_count`` by median cuts.
+
+    Each cut halves a tile along the longest axis of its points, so tiles
+    stay compact. Returns a list of index arrays into ``centers``.
+    """
+
+    tiles = []
+    stack = [np.arange(len(centers))]
+    max_count = max(int(max_count), 1)
+
+    while stack:
+        index = stack.pop()
+        if len(index) <= max_count:
+            tiles.append(index)
+            continue
+
+        points = centers[index]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        half = len(index) // 2
+        order = np.argpartition(points[:, axis], half)
+        stack.append(index[order[half:]])
+        stack.append(index[order[:half]])
+
+    return tiles
+
+
+def triangle_centers(co, tris, chunk_size=1 << 20):
+    # Chunked so the (N, 3, 3) corner array is never built for the whole mesh
+
+    centers = np.empty((len(tris), 3), dtype=np.float32)
+    for start in range(0, len(tris), chunk_size):
+        centers[start:start + chunk_size] = co[tris[start:start + chunk_size]].mean(axis=1)
+
+    return centers
+
+
+def tile_bounds(co, tris, tiles):
+    """(lo, hi) corners of the bounding box of each tile's triangles, (n, 3) each."""
+
+    lo = np.empty((len(tiles), 3), dtype=np.float32)
+    hi = np.empty((len(tiles), 3), dtype=np.float32)
+    for i, index in enumerate(tiles):
+        tri_co = co[tris[index]]
+        lo[i] = tri_co.min(axis=(0, 1))
+        hi[i] = tri_co.max(axis=(0, 1))
+
+    return lo, hi
+
+
+def triangles_in_box(co, tris, lo, hi, tiles, bounds, chunk_size=1 << 20):
+    """Sorted indices of the triangles whose bounds overlap the box (lo, hi).
+
+    Only the triangles of the ``tiles`` whose ``bounds`` (see tile_bounds())
+    overlap the box are tested, so a query costs the neighbouring tiles
+    rather than the whole mesh.
+    """
+
+    tile_lo, tile_hi = bounds
+    hit = np.all(tile_hi >= lo, axis=1) & np.all(tile_lo <= hi, axis=1)
+    candidates = [tiles[i] for i in np.flatnonzero(hit)]
+    if not candidates:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.sort(np.concatenate(candidates))
+
+    found = []
+    for start in range(0, len(candidates), chunk_size):
+        index = candidates[start:start + chunk_size]
+        tri_co = co[tris[index]]
+        inside = np.all(tri_co.max(axis=1) >= lo, axis=1) & np.all(tri_co.min(axis=1) <= hi, axis=1)
+        found.append(index[inside])
+
+    return np.concatenate(found)
+
+
+def iter_tiled_masks(obj, checks, tolerance, angle_distort, thickness, budget, chunk_size=4096, arrays=None):
+    """Health masks computed one spatial tile at a time, see iter_mesh_health().
+
+    The whole mesh buffers are read once and count against ``budget``,
+    triangles are split into tiles of about half of the rest as working set.
+    Per face checks only look at the faces of the tile. Thickness and self
+    intersection build a tree of the tile plus the neighbouring triangles
+    within the ray length, found through the bounds of the other tiles, which
+    finds every hit of the tile's own triangles. Results are merged into
+    mesh-wide face masks.
+    """
+    import time
+
+    from mathutils.bvhtree import BVHTree
+
+    timings = {name.lower(): 0.0 for name in ["read", "tiles"] + checks}
+    start = time.perf_counter()
+
+    if arrays is None and ("CONCAVE" in checks or "DISTORTED" in checks):
+        # Per face checks need the loops, their triangles serve the trees too
+        arrays = mesh_concave_arrays(obj.data, centers=False)
+
+    if arrays is None:
+        snapshot = mesh_snapshot(obj, transform=True)
+        co = snapshot["co"]
+        tris = snapshot["tris"]
+        face_map = snapshot["face_map"]
+        face_count = snapshot["face_count"]
+        resident = sizeof_value(snapshot)
+    else:
+        matrix = np.array(obj.matrix_world, dtype=np.float32)
+        co = arrays["co"] @ matrix[:3, :3].T + matrix[:3, 3]
+        tris = arrays["tri_vert"]
+        face_map = arrays["tri_poly"]
+        face_count = len(arrays["loop_start"])
+        resident = sizeof_value(arrays) + co.nbytes
+
+    masks = {check: np.zeros(face_count, dtype=bool) for check in checks}
+    timings["read"] = time.perf_counter() - start
+    start = time.perf_counter()
+
+    # Whole mesh buffers stay resident, tiles get what is left of the budget
+    centers = triangle_centers(co, tris)
+    resident += centers.nbytes + sum(mask.nbytes for mask in masks.values())
+    tile_budget = max(budget - resident, 1024 * TILE_BYTES_PER_TRI)
+    if resident > budget:
+        profiler.count("tile budget exceeded by mesh buffers")
+
+    tiles = spatial_tiles(centers, tile_budget // (2 * TILE_BYTES_PER_TRI))
+    del centers
+    # The tiles double as the index for finding a tile's neighbours
+    bounds = tile_bounds(co, tris, tiles)
+    profiler.count("tiles", len(tiles))
+    timings["tiles"] = time.perf_counter() - start
+
+    use_tree = "SELF_INTERSECT" in checks or "THICKNESS" in checks
+    margin = 0.0001 + (thickness if "THICKNESS" in checks else 0.0)
+    area = 0.0
+
+    for n, core in enumerate(tiles):
+        yield n / len(tiles), f"Tile {n + 1}/{len(tiles)} {obj.name}"
+
+        tri_co = co[tris[core]].astype(np.float64)
+        area += 0.5 * np.linalg.norm(np.cross(tri_co[:, 1] - tri_co[:, 0], tri_co[:, 2] - tri_co[:, 0]), axis=1).sum()
+        del tri_co
+
+        faces = np.unique(face_map[core])
+        for check, face_mask in (("CONCAVE", concave_face_mask), ("DISTORTED", distorted_face_mask)):
+            if check in checks:
+                t = time.perf_counter()
+                masks[check][faces] |= face_mask(arrays, tolerance if check == "CONCAVE" else angle_distort, faces)
+                timings[check.lower()] += time.perf_counter() - t
+
+        if not use_tree:
+            continue
+
+        # The tile and its neighbours, with the vertices renumbered
+        t = time.perf_counter()
+        near = triangles_in_box(co, tris, bounds[0][n] - margin, bounds[1][n] + margin, tiles, bounds)
+        verts, local = np.unique(tris[near], return_inverse=True)
+        local = local.reshape(-1, 3)
+        near_map = face_map[near]
+        tree = BVHTree.FromPolygons(co[verts].tolist(), local.tolist(), all_triangles=True, epsilon=0.00001)
+        timings["tiles"] += time.perf_counter() - t
+
+        if "SELF_INTERSECT" in checks:
+            t = time.perf_counter()
+            masks["SELF_INTERSECT"][self_overlap_faces(tree, near_map)] = True
+            timings["self_intersect"] += time.perf_counter() - t
+
+        if "THICKNESS" in checks:
+            t = time.perf_counter()
+            sources = np.searchsorted(near, core)
+            steps = iter_thick_faces(co[verts], local, near_map, tree, thickness, chunk_size, f"Tile {n + 1}/{len(tiles)} {obj.name}", sources, near)
+            faces = yield from iter_scaled(steps, n / len(tiles), (n + 1) / len(tiles))
+            masks["THICKNESS"][faces] = True
+            timings["thickness"] += time.perf_counter() - t
+
+        del tree, near, verts, local, near_map
+
+    return masks, timings, face_count, len(tris), area
+
+
+# UV
+# -------------------------------------
+
+
+def connected_components(count, a, b):
+    """Label ``count`` nodes joined by the edges ``a[i]``-``b[i]``, labels are 0..n-1."""
+
+    parent = np.arange(count)
+
+    while True:
+        pa = parent[a]
+        pb = parent[b]
+        join = pa != pb
+        if not join.any():
+            break
+
+        # Hook the larger root onto the smaller, then flatten every tree
+        np.minimum.at(parent, np.maximum(pa[join], pb[join]), np.minimum(pa[join], pb[join]))
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+
+    return np.unique(parent, return_inverse=True)[1]
+
+
+def row_groups(rows):
+    """Returns an id per row of a 2D array, equal rows get the same id."""
+
+    if not len(rows):
+        return np.zeros(0, dtype=np.int64)
+
+    order = np.lexsort(rows.T[::-1])
+    ordered = rows[order]
+    step = np.empty(len(rows), dtype=np.int64)
+    step[0] = 0
+    step[1:] = np.any(ordered[1:] != ordered[:-1], axis=1)
+
+    ids = np.empty(len(rows), dtype=np.int64)
+    ids[order] = np.cumsum(step)
+
+    return ids
+
+
+@profiled("lib.uv_islands")
+def uv_islands(uv, loop_vert, loop_start, loop_total, precision=1e-5):
+    """Returns the island index of every loop.
+
+    Loops of one face are in one island, loops of neighbouring faces are
+    joined when they share both the vertex and the UV coordinate.
+    """
+
+    key = np.column_stack((loop_vert, np.round(uv / precision).astype(np.int64)))
+    uv_vert = row_groups(key)
+
+    poly, loop, l_prev, l_next = loop_neighbors(loop_start, loop_total)
+    component = connected_components(uv_vert.max() + 1 if len(uv_vert) else 0, uv_vert[loop], uv_vert[l_next])
+
+    return component[uv_vert]
+
+
+def uv_island_shapes(uv, island, loop_start, loop_total, precision=1e-3):
+    """Returns (centroid, angle, key) per island.
+
+    ``angle`` is the direction of the principal axis, with the sign picked
+    by the skew along it. ``key`` holds rotation invariant shape
+    descriptors, rounded to ``precision``, so equal rows are similar islands.
+    """
+
+    count = island.max() + 1
+    n = np.bincount(island, minlength=count).astype(np.float64)
+    faces = np.bincount(island[loop_start], minlength=count)
+
+    centroid = np.column_stack((
+        np.bincount(island, uv[:, 0], count),
+        np.bincount(island, uv[:, 1], count),
+    )) / n[:, None]
+
+    d = uv - centroid[island]
+    sxx = np.bincount(island, d[:, 0] * d[:, 0], count)
+    syy = np.bincount(island, d[:, 1] * d[:, 1], count)
+    sxy = np.bincount(island, d[:, 0] * d[:, 1], count)
+
+    spread = sxx + syy
+    aniso = np.sqrt((sxx - syy) ** 2 + 4.0 * sxy * sxy)
+    angle = 0.5 * np.arctan2(2.0 * sxy, sxx - syy)
+    # Shapes symmetric about the major axis have no skew along it, use the minor one
+    major = np.column_stack((np.cos(angle), np.sin(angle)))[island]
+    skew = np.bincount(island, np.einsum("ij,ij->i", d, major) ** 3, count)
+    skew_minor = np.bincount(island, (d[:, 1] * major[:, 0] - d[:, 0] * major[:, 1]) ** 3, count)
+    flat = np.abs(skew) <= 1e-3 * n * (spread / n) ** 1.5
+    skew[flat] = skew_minor[flat]
+    angle[skew < 0.0] += np.pi
+    # No principal axis (squares, discs), such islands are only moved
+    angle[aniso <= 1e-4 * spread] = 0.0
+
+    # Signed area, mirrored islands must not stack onto each other
+    poly, loop, l_prev, l_next = loop_neighbors(loop_start, loop_total)
+    cross = uv[loop, 0] * uv[l_next, 1] - uv[l_next, 0] * uv[loop, 1]
+    area = 0.5 * np.bincount(island[loop], cross, count)
+
+    scale = precision * precision
+    key = np.column_stack((
+        n,
+        faces,
+        np.round(area / scale),
+        np.round(spread / n / scale),
+        np.round(aniso / n / scale),
+    ))
+
+    return centroid, angle, key
+
+
+@profiled("lib.uv_stack_unstack")
+def uv_stack_unstack(uv, island, loop_start, loop_total, islands_used=None, axis="U", margin=0.005):
+    """Stack similar islands, then lay each stack out in a row along ``axis``.
+
+    Islands are grouped by shape key, every island is rotated and moved onto
+    the first of its group, then the n-th copy is offset n times the group's
+    extent plus ``margin``. Only ``islands_used`` (bool per island) move.
+    Returns (new uv, number of islands moved).
+    """
+
+    count = island.max() + 1
+    centroid, angle, key = uv_island_shapes(uv, island, loop_start, loop_total)
+
+    if islands_used is None:
+        islands_used = np.ones(count, dtype=bool)
+    used = np.flatnonzero(islands_used)
+    if not len(used):
+        return uv, 0
+
+    group = row_groups(key[used])
+
+    # Rank of every used island in its group, the first one stays put
+    order = np.lexsort((used, group))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = group[order][1:] != group[order][:-1]
+    head = np.maximum.accumulate(np.where(first, np.arange(len(order)), 0))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order)) - head
+    master = np.empty(len(order), dtype=np.int64)
+    master[order] = used[order][head]
+
+    # Per island bounds along the layout axis
+    dim = 0 if axis in {"U", "-U"} else 1
+    sign = -1.0 if axis.startswith("-") else 1.0
+    low = np.full(count, np.inf)
+    high = np.full(count, -np.inf)
+    np.minimum.at(low, island, uv[:, dim])
+    np.maximum.at(high, island, uv[:, dim])
+    extent = high - low
+
+    theta = np.zeros(count)
+    target = centroid.copy()
+    theta[used] = angle[master] - angle[used]
+    target[used] = centroid[master]
+    target[used, dim] += sign * rank * (extent[master] + margin)
+
+    loops = islands_used[island]
+    isl = island[loops]
+    d = uv[loops] - centroid[isl]
+    cos = np.cos(theta[isl])
+    sin = np.sin(theta[isl])
+
+    out = uv.copy()
+    out[loops, 0] = cos * d[:, 0] - sin * d[:, 1] + target[isl, 0]
+    out[loops, 1] = sin * d[:, 0] + cos * d[:, 1] + target[isl, 1]
+
+    return out, int(np.count_nonzero(rank))
+
+
+@profiled("lib.mesh_stack_unstack_uvs")
+def mesh_stack_unstack_uvs(me, axis="U", margin=0.005, selected=True):
+    """Stack and unstack the islands of the active UV map, object mode only.
+
+    With ``selected`` only islands holding a selected face move, or all of
+    them when no face is selected. Returns the number of islands moved.
+    """
+
+    uv_layer = me.uv_layers.active
+    if uv_layer is None or not len(me.loops):
+        return 0
+
+    arrays = mesh_loop_arrays(me)
+    loop_start = arrays["loop_start"]
+    loop_total = arrays["loop_total"]
+
+    uv = np.empty(len(me.loops) * 2, dtype=np.float32)
+    uv_layer.data.foreach_get("uv", uv)
+    uv = uv.reshape(-1, 2).astype(np.float64)
+
+    island = uv_islands(uv, arrays["loop_vert"], loop_start, loop_total)
+    profiler.count("uv islands", int(island.max()) + 1)
+
+    islands_used = None
+    if selected:
+        select = np.empty(len(me.polygons), dtype=bool)
+        me.polygons.foreach_get("select", select)
+        if select.any():
+            islands_used = np.zeros(island.max() + 1, dtype=bool)
+            islands_used[island[loop_start[select]]] = True
+
+    uv, moved = uv_stack_unstack(uv, island, loop_start, loop_total, islands_used, axis, margin)
+
+    uv_layer.data.foreach_set("uv", uv.astype(np.float32).ravel())
+    me.update()
+
+    return moved
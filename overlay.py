@@ -0,0 +1,137 @@
+# Viewport overlay for flagged faces, drawn with the gpu module instead of
+# writing selection or normals into the mesh.
+
+import bpy
+import gpu
+import numpy as np
+from gpu_extras.batch import batch_for_shader
+
+
+COLORS = {
+    "concave": (1.0, 0.2, 0.1, 0.45),
+}
+DEFAULT_COLOR = (1.0, 0.6, 0.0, 0.45)
+
+# (layer, object name) -> {"key", "batch"}
+layers = {}
+_handle = None
+_shader = None
+
+
+def get_shader():
+    global _shader
+
+    if _shader is None:
+        name = "UNIFORM_COLOR" if bpy.app.version >= (4, 0, 0) else "3D_UNIFORM_COLOR"
+        _shader = gpu.shader.from_builtin(name)
+
+    return _shader
+
+
+def buffers_key(co, tris) -> bytes:
+    import hashlib
+
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(co, dtype=np.float32).tobytes())
+    h.update(np.ascontiguousarray(tris, dtype=np.int32).tobytes())
+
+    return h.digest()
+
+
+def show(layer, ob, co, tris):
+    """Draw the (K, 3) triangles ``tris`` over ``co`` in object space.
+
+    The batch is only rebuilt when the buffers differ from the last call.
+    """
+
+    # Nothing to draw on and no GPU context without a UI
+    if bpy.app.background:
+        return
+
+    entry_key = (layer, ob.name)
+    if not len(tris):
+        hide(layer, ob)
+        return
+
+    key = buffers_key(co, tris)
+    entry = layers.get(entry_key)
+    if entry is not None and entry["key"] == key:
+        return
+
+    # Only the vertices used by the triangles go to the GPU
+    used, tris = np.unique(tris, return_inverse=True)
+    batch = batch_for_shader(
+        get_shader(),
+        "TRIS",
+        {"pos": np.asarray(co, dtype=np.float32)[used]},
+        indices=tris.reshape(-1, 3).astype(np.int32),
+    )
+    layers[entry_key] = {"key": key, "batch": batch}
+    tag_redraw()
+
+
+def hide(layer, ob):
+    if layers.pop((layer, ob.name), None) is not None:
+        tag_redraw()
+
+
+def clear(layer=None):
+    for entry_key in list(layers):
+        if layer is None or entry_key[0] == layer:
+            del layers[entry_key]
+    tag_redraw()
+
+
+def tag_redraw():
+    wm = bpy.context.window_manager
+    if wm is None:
+        return
+
+    for window in wm.windows:
+        for area in window.screen.areas:
+            if area.type == "VIEW_3D":
+                area.tag_redraw()
+
+
+def draw():
+    if not layers:
+        return
+
+    shader = get_shader()
+    gpu.state.blend_set("ALPHA")
+    gpu.state.depth_test_set("LESS_EQUAL")
+    gpu.state.face_culling_set("NONE")
+
+    objects = bpy.data.objects
+    for (layer, name), entry in list(layers.items()):
+        ob = objects.get(name)
+        if ob is None:
+            del layers[(layer, name)]
+            continue
+        if not ob.visible_get():
+            continue
+
+        shader.uniform_float("color", COLORS.get(layer, DEFAULT_COLOR))
+        with gpu.matrix.push_pop():
+            gpu.matrix.multiply_matrix(ob.matrix_world)
+            entry["batch"].draw(shader)
+
+    gpu.state.depth_test_set("NONE")
+    gpu.state.blend_set("NONE")
+
+
+def register():
+    global _handle
+
+    if _handle is None:
+        _handle = bpy.types.SpaceView3D.draw_handler_add(draw, (), "WINDOW", "POST_VIEW")
+
+
+def unregister():
+    global _handle, _shader
+
+    if _handle is not None:
+        bpy.types.SpaceView3D.draw_handler_remove(_handle, "WINDOW")
+        _handle = None
+    layers.clear()
+    _shader = None